@@ -0,0 +1,65 @@
+"""Records/sec of schema conformance and validation on order fixtures.
+
+Run with `python benchmarks/conformance.py` from the repository root. Compares
+the SDK's conformance with the stream's specialized and trusted conformers,
+and `jsonschema` with `fastjsonschema` validation.
+"""
+
+import copy
+import time
+
+from jsonschema import Draft4Validator
+from singer_sdk.helpers._catalog import pop_deselected_record_properties
+from singer_sdk.helpers._typing import conform_record_data_types
+
+from tap_woocommerce.streams import OrdersStream
+from tap_woocommerce.tap import TapWooCommerce
+from tap_woocommerce.tests.fake_store import FakeStore, make_order, store_config
+
+RECORDS = 5000
+
+
+def measure(name: str, records: list, process) -> None:
+    """Print the rate at which `process` handles copies of `records`."""
+    records = copy.deepcopy(records)
+    started = time.perf_counter()
+    for record in records:
+        process(record)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<32}{len(records) / elapsed:>12,.0f} records/s")
+
+
+def main() -> None:
+    """Run every benchmark on the same order fixtures."""
+    with FakeStore({"orders": []}) as store:
+        stream = OrdersStream(tap=TapWooCommerce(config=store_config(store)))
+        trusted = OrdersStream(
+            tap=TapWooCommerce(config=store_config(store, trusted_streams=["orders"]))
+        )
+    orders = [
+        stream.record_transformer(make_order(i, "2024-01-01T10:00:00"), None)
+        for i in range(RECORDS)
+    ]
+
+    def sdk_conform(record: dict) -> dict:
+        pop_deselected_record_properties(
+            record, stream.schema, stream.mask, stream.logger
+        )
+        return conform_record_data_types(
+            stream.name, record, stream.schema, stream.logger
+        )
+
+    measure("SDK conformance", orders, sdk_conform)
+    measure("specialized conformer", orders, stream.record_conformer)
+    measure("trusted conformer", orders, trusted.record_conformer)
+
+    conformed = [stream.record_conformer(copy.deepcopy(order)) for order in orders]
+    validator = Draft4Validator(stream.schema)
+    measure(
+        "jsonschema validation", conformed, lambda r: list(validator.iter_errors(r))
+    )
+    measure("compiled validation", conformed, stream.record_validator)
+
+
+if __name__ == "__main__":
+    main()
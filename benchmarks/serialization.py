@@ -0,0 +1,68 @@
+"""Messages/sec of the Singer message encoders and output buffering.
+
+Run with `python benchmarks/serialization.py` from the repository root. Writes
+RECORD messages of order fixtures with each encoder, unbuffered and buffered,
+with and without gzip, to a temporary file.
+"""
+
+import tempfile
+import time
+from decimal import Decimal
+
+import singer
+
+from tap_woocommerce.tests.fake_store import make_order
+from tap_woocommerce.writer import ENCODERS, MessageWriter, orjson
+
+MESSAGES = 20000
+
+
+def make_messages() -> list:
+    """Return RECORD messages of orders with integral and non-integral decimals."""
+    messages = []
+    for i in range(MESSAGES):
+        order = make_order(i, "2024-01-01T10:00:00")
+        order["customer_id"] = Decimal(order["customer_id"])
+        if i % 100 == 0:
+            order["total"] = Decimal(order["total"])
+        messages.append(singer.RecordMessage(stream="orders", record=order))
+    return messages
+
+
+def measure(name: str, messages: list, **settings) -> None:
+    """Print the rate at which a writer with `settings` writes `messages`."""
+    with tempfile.TemporaryFile() as output:
+        writer = MessageWriter(output, **settings)
+        started = time.perf_counter()
+        for message in messages:
+            writer.write_message(message)
+        writer.close()
+        elapsed = time.perf_counter() - started
+        size = output.tell()
+    rate = len(messages) / elapsed
+    print(f"{name:<36}{rate:>12,.0f} messages/s{size / 1024 / 1024:>10.1f} MB")
+
+
+def main() -> None:
+    """Run every encoder and output setting on the same messages."""
+    messages = make_messages()
+    encoders = [name for name in ENCODERS if name != "orjson" or orjson is not None]
+    for encoder in encoders:
+        measure(f"{encoder}, unbuffered", messages, encoder=encoder)
+        measure(
+            f"{encoder}, 1 MB buffer",
+            messages,
+            encoder=encoder,
+            buffer_size=1024 * 1024,
+        )
+        measure(
+            f"{encoder}, 1 MB buffer, gzip",
+            messages,
+            encoder=encoder,
+            buffer_size=1024 * 1024,
+            compress=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""MB/s of splitting a page into raw records against decoding it.
+
+Run with `python benchmarks/split.py` from the repository root. Compares
+`split_records` and the brace-counting fallback it uses for deeply nested
+records with `json.loads`, and with `json.loads` plus re-encoding every
+record, on a page of order fixtures.
+"""
+
+import json
+import time
+from typing import Callable
+
+from tap_woocommerce.client import SEPARATORS, end_of_object, split_records
+from tap_woocommerce.tests.fake_store import make_order
+
+ORDERS = 5000
+ROUNDS = 5
+
+
+def count_braces(body: bytes) -> list:
+    """Split a page like `split_records` does for records nested too deep."""
+    spans, start = [], SEPARATORS.match(body).end()
+    while body.startswith(b"{", start):
+        end = end_of_object(body, start)
+        spans.append(body[start:end])
+        start = SEPARATORS.match(body, end).end()
+    return spans
+
+
+def measure(name: str, body: bytes, split: Callable[[bytes], list]) -> None:
+    """Print the best rate at which `split` gets the records of `body`."""
+    best = float("inf")
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        records = split(body)
+        best = min(best, time.perf_counter() - started)
+    assert len(records) == ORDERS
+    print(f"{name:<36}{len(body) / best / 1024 / 1024:>10.1f} MB/s")
+
+
+def main() -> None:
+    """Run every splitter on the same page."""
+    orders = [make_order(i, "2024-01-01T10:00:00") for i in range(ORDERS)]
+    body = json.dumps(orders, separators=(",", ":")).encode()
+    measure("split_records", body, lambda body: list(split_records(body)))
+    measure("brace counting", body, count_braces)
+    measure("json.loads", body, json.loads)
+    measure(
+        "json.loads + json.dumps",
+        body,
+        lambda body: [json.dumps(record) for record in json.loads(body)],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""BATCH message output: records are written to local files instead of stdout."""
+
+import gzip
+import os
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import singer
+
+from tap_woocommerce.writer import MessageWriter
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class BatchFile:
+    """A batch file of a single stream that is still being written."""
+
+    def __init__(self, path: str, file_format: str) -> None:
+        self.path = path
+        self.file_format = file_format
+        self.record_count = 0
+        self.records: List[dict] = []
+        self.file = gzip.open(path, "wb") if file_format == "jsonl" else None
+
+    def write(self, message: singer.RecordMessage, line: bytes) -> None:
+        if self.file is not None:
+            self.file.write(line)
+        else:
+            self.records.append(message.record)
+        self.record_count += 1
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+        else:
+            table = pyarrow.Table.from_pylist(self.records)
+            pyarrow.parquet.write_table(table, self.path)
+            self.records = []
+
+
+class BatchWriter:
+    """Writes RECORD messages to batch files and emits a BATCH message per file.
+
+    Files roll over after `batch_size` records. STATE messages are held back
+    while any batch is open and written right after the batches are flushed,
+    so a bookmark never covers records that are not in a complete file.
+    """
+
+    def __init__(
+        self,
+        message_writer: MessageWriter,
+        output_dir: str,
+        batch_size: int = 100000,
+        file_format: str = "jsonl",
+    ) -> None:
+        if file_format == "parquet" and pyarrow is None:
+            raise ImportError("Parquet batches require `pip install pyarrow`.")
+        os.makedirs(output_dir, exist_ok=True)
+        self.message_writer = message_writer
+        self.output_dir = output_dir
+        self.batch_size = batch_size
+        self.file_format = file_format
+        self.batches: Dict[str, BatchFile] = {}
+        self.pending_states: Dict[str, Callable[[], None]] = {}
+        self.lock = threading.RLock()
+
+    @classmethod
+    def from_config(
+        cls, config: dict, message_writer: MessageWriter
+    ) -> Optional["BatchWriter"]:
+        """Return a batch writer if `batch_output_dir` is configured."""
+        if not config.get("batch_output_dir"):
+            return None
+        return cls(
+            message_writer,
+            config["batch_output_dir"],
+            batch_size=config.get("batch_size", 100000),
+            file_format=config.get("batch_format", "jsonl"),
+        )
+
+    def _open_batch(self, stream_name: str) -> BatchFile:
+        extension = "jsonl.gz" if self.file_format == "jsonl" else "parquet"
+        file_name = f"{stream_name}-{uuid.uuid4().hex}.{extension}"
+        return BatchFile(os.path.join(self.output_dir, file_name), self.file_format)
+
+    def write(self, message: singer.RecordMessage) -> bool:
+        """Add a record to its stream's batch, return whether a batch is full."""
+        line = self.message_writer.encode(message)
+        with self.lock:
+            batch = self.batches.get(message.stream)
+            if batch is None:
+                batch = self.batches[message.stream] = self._open_batch(message.stream)
+            batch.write(message, line)
+            return batch.record_count >= self.batch_size
+
+    def defer_state(self, stream_name: str, write_state: Callable[[], None]) -> bool:
+        """Hold back a stream's STATE message while batches are open.
+
+        Returns whether the message was deferred. `write_state` is called once
+        the open batches are flushed.
+        """
+        with self.lock:
+            if not self.batches:
+                return False
+            self.pending_states[stream_name] = write_state
+            return True
+
+    def flush(self) -> None:
+        """Close all open batches, emit their BATCH messages, then held STATE."""
+        with self.lock:
+            batches, self.batches = self.batches, {}
+            for stream_name, batch in batches.items():
+                batch.close()
+                self.message_writer.write_message(
+                    singer.BatchMessage(
+                        stream=stream_name,
+                        filepath=os.path.abspath(batch.path),
+                        file_format=self.file_format,
+                        compression="gzip" if self.file_format == "jsonl" else None,
+                        batch_size=batch.record_count,
+                    )
+                )
+            pending_states, self.pending_states = self.pending_states, {}
+        for write_state in pending_states.values():
+            write_state()
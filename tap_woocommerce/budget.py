@@ -0,0 +1,31 @@
+"""Byte budget shared by everything that holds fetched pages in memory."""
+
+import threading
+
+
+class MemoryBudget:
+    """Counting semaphore over bytes.
+
+    Producers acquire the size of a page before handing it on and block while
+    the budget is exhausted; consumers release it once the page is emitted.
+    A page larger than the whole budget is let through when nothing else is
+    outstanding, so it cannot block forever.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.used = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, size: int) -> None:
+        """Block until `size` bytes fit in the budget, then take them."""
+        with self.condition:
+            while self.used and self.used + size > self.limit:
+                self.condition.wait()
+            self.used += size
+
+    def release(self, size: int) -> None:
+        """Return `size` bytes to the budget."""
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
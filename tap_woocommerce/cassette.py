@@ -0,0 +1,124 @@
+"""Recording and replay of HTTP exchanges, for offline and reproducible runs."""
+
+import base64
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from typing import Deque, Dict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Never written to a cassette, and ignored when matching requests.
+SECRET_PARAMS = {"consumer_key", "consumer_secret"}
+
+
+def request_key(method: str, url: str) -> str:
+    """Return the method and URL of a request, without credentials."""
+    parts = urlsplit(url)
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in SECRET_PARAMS
+    )
+    return f"{method} {urlunsplit(parts._replace(query=urlencode(query)))}"
+
+
+def build_response(
+    request: requests.PreparedRequest,
+    status: int,
+    reason: str,
+    headers: dict,
+    content: bytes,
+    elapsed: float,
+) -> requests.Response:
+    """Return a response to a request built from stored parts."""
+    response = requests.Response()
+    response.status_code = status
+    response.reason = reason
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers) or "utf-8"
+    response._content = content
+    response.elapsed = timedelta(seconds=elapsed)
+    response.url = request.url
+    response.request = request
+    return response
+
+
+class Cassette:
+    """A gzipped JSON-lines file of HTTP exchanges.
+
+    In `record` mode every response is appended with its status, headers, body
+    and elapsed time. In `replay` mode requests are answered from the file:
+    repeated requests get the recorded responses in order, then the last one
+    again. `latency` scales the recorded elapsed time slept before answering.
+    """
+
+    def __init__(self, path: str, mode: str, latency: float = 0) -> None:
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.exchanges: Dict[str, Deque[dict]] = defaultdict(deque)
+        if mode == "record":
+            self.file = gzip.open(path, "wt")
+        else:
+            self.file = None
+            with gzip.open(path, "rt") as cassette:
+                for line in cassette:
+                    exchange = json.loads(line)
+                    self.exchanges[exchange["request"]].append(exchange)
+
+    def record(
+        self, request: requests.PreparedRequest, response: requests.Response
+    ) -> None:
+        """Append an exchange to the cassette."""
+        exchange = {
+            "request": request_key(request.method, request.url),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "elapsed": response.elapsed.total_seconds(),
+        }
+        try:
+            exchange["body"] = response.content.decode()
+        except UnicodeDecodeError:
+            exchange["body_base64"] = base64.b64encode(response.content).decode()
+        line = json.dumps(exchange) + "\n"
+        with self.lock:
+            self.file.write(line)
+
+    def replay(self, request: requests.PreparedRequest) -> requests.Response:
+        """Return the recorded response to a request."""
+        key = request_key(request.method, request.url)
+        with self.lock:
+            recorded: Deque[dict] = self.exchanges.get(key, deque())
+            if not recorded:
+                raise LookupError(f"No recorded response for {key}")
+            exchange = recorded.popleft() if len(recorded) > 1 else recorded[0]
+        if self.latency:
+            time.sleep(exchange["elapsed"] * self.latency)
+        if "body" in exchange:
+            content = exchange["body"].encode()
+        else:
+            content = base64.b64decode(exchange["body_base64"])
+        return build_response(
+            request,
+            exchange["status"],
+            exchange["reason"],
+            exchange["headers"],
+            content,
+            exchange["elapsed"],
+        )
+
+    def close(self) -> None:
+        if self.file is not None:
+            with self.lock:
+                self.file.close()
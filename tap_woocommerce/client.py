@@ -1,28 +1,220 @@
 """REST client handling, including WooCommerceStream base class."""
 
+import copy
+import fnmatch
+import json
 import logging
+import re
+import math
+import queue
+import threading
 from datetime import datetime, timedelta
-from typing import Any, Dict, Iterable, Optional, cast, Callable
+from typing import Any, Dict, Iterable, List, Optional, Tuple, cast, Callable
 
 import backoff
 import requests
+from jsonschema import Draft4Validator
 from urllib3.exceptions import ProtocolError
 from random_user_agent.user_agent import UserAgent
 from random_user_agent.params import SoftwareName, OperatingSystem, Popularity
 from singer_sdk.authenticators import BasicAuthenticator
+from singer import RecordMessage
+from singer.utils import strftime, strptime_to_utc
+from singer_sdk.helpers._catalog import pop_deselected_record_properties
+from singer_sdk.helpers._typing import (
+    _warn_unmapped_property,
+    conform_record_data_types,
+    is_boolean_type,
+    to_json_compatible,
+)
+from singer_sdk.helpers._util import utc_now
 from singer_sdk.helpers.jsonpath import extract_jsonpath
 from singer_sdk.streams import RESTStream
 from singer_sdk.exceptions import FatalAPIError, RetriableAPIError
 from http.client import RemoteDisconnected
+from tap_woocommerce.scheduler import DeadlineReached
+from tap_woocommerce.resilience import CircuitBreaker, LatencyTracker
+from tap_woocommerce.id_set import IdSet
+from tap_woocommerce.emitted_index import EmittedIndex, content_hash, record_version
+from tap_woocommerce.snapshot_cache import SnapshotCache
+from tap_woocommerce.writer import MessageWriter
 from requests.exceptions import ChunkedEncodingError
 
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
 logging.getLogger("backoff").setLevel(logging.CRITICAL)
 
 
+class ServerAPIError(RetriableAPIError):
+    """A 5xx response, which may be caused by a single broken record."""
+
+
+class StreamUnavailableError(FatalAPIError):
+    """The stream's circuit breaker is open or its retry budget is used up."""
+
+
+# Value types that pass through schema conformance untouched.
+PLAIN_TYPES = (str, int, float, list, dict, type(None))
+
+
+def default_replication_key(replication_key: str) -> Callable:
+    """Return a fix-up filling a missing replication key from `date_created`."""
+
+    def fixup(row: dict, context: Optional[dict]) -> None:
+        if row.get(replication_key) is None:
+            if row.get("date_created"):
+                row[replication_key] = row["date_created"]
+            else:
+                row[replication_key] = datetime(1970, 1, 1)
+
+    return fixup
+
+
+def coerce_parent_id(row: dict, context: Optional[dict]) -> None:
+    """Coerce `parent_id` to an int, falling back to 0."""
+    if "parent_id" in row:
+        try:
+            row["parent_id"] = int(row["parent_id"])
+        except:
+            row["parent_id"] = 0
+
+
+def stringify_bool_price(row: dict, context: Optional[dict]) -> None:
+    """Stores send `price: false` for products without a price."""
+    if isinstance(row.get("price"), bool):
+        row["price"] = str(row["price"])
+
+
+def meta_data_filter(
+    include: Optional[List[str]],
+    exclude: Optional[List[str]],
+    max_value_length: Optional[int],
+) -> Callable:
+    """Return a fix-up dropping unwanted `meta_data` entries.
+
+    `include` and `exclude` are lists of key patterns such as `_wc_order_*`.
+    Entries whose value is longer than `max_value_length` characters (of its
+    JSON, for non-string values) are dropped as well.
+    """
+    include_re = include and re.compile("|".join(map(fnmatch.translate, include)))
+    exclude_re = exclude and re.compile("|".join(map(fnmatch.translate, exclude)))
+
+    def keep(entry: Any) -> bool:
+        if not isinstance(entry, dict):
+            return True
+        key = entry.get("key") or ""
+        if include_re and not include_re.match(key):
+            return False
+        if exclude_re and exclude_re.match(key):
+            return False
+        if max_value_length:
+            value = entry.get("value")
+            length = len(value) if isinstance(value, str) else len(json.dumps(value))
+            return length <= max_value_length
+        return True
+
+    def fixup(row: dict) -> None:
+        if row.get("meta_data"):
+            row["meta_data"] = [entry for entry in row["meta_data"] if keep(entry)]
+
+    return fixup
+
+
+# Everything up to the next brace outside a JSON string, then that brace.
+NEXT_BRACE = re.compile(rb'[^"{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}]*)*([{}])')
+# The separators between the objects of a JSON array.
+SEPARATORS = re.compile(rb"[\s,\[]*")
+
+
+def nested_object_pattern(depth: int) -> "re.Pattern[bytes]":
+    """Return a regex matching a JSON object nested at most `depth` levels deep.
+
+    Matching whole records in the regex engine is several times faster than
+    counting their braces in Python.
+    """
+    between = rb'[^"{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}]*)*'
+    pattern = rb"\{" + between + rb"\}"
+    for _ in range(depth - 1):
+        pattern = rb"\{" + between + rb"(?:" + pattern + between + rb")*\}"
+    return re.compile(pattern)
+
+
+SHALLOW_OBJECT = nested_object_pattern(6)
+
+
+def end_of_object(body: bytes, start: int) -> int:
+    """Return the end of the JSON object starting at `start` by counting braces."""
+    depth = 0
+    for match in NEXT_BRACE.finditer(body, start):
+        if body[match.start(1)] == ord("{"):
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    raise ValueError("Unterminated JSON object.")
+
+
+def split_records(body: bytes) -> Iterable[bytes]:
+    """Yield the raw JSON of every object in a JSON array of objects."""
+    start = SEPARATORS.match(body).end()
+    while body.startswith(b"{", start):
+        match = SHALLOW_OBJECT.match(body, start)
+        end = match.end() if match else end_of_object(body, start)
+        yield body[start:end]
+        start = SEPARATORS.match(body, end).end()
+
+
+def top_level_value(span: bytes, pattern: "re.Pattern[bytes]") -> Optional[str]:
+    """Return the string `pattern` captures from a property of the object itself.
+
+    Matches in nested objects, such as a line item's `date_modified`, are skipped.
+    """
+    for match in pattern.finditer(span):
+        depth = 0
+        for brace in NEXT_BRACE.finditer(span, 0, match.start()):
+            depth += 1 if span[brace.start(1)] == ord("{") else -1
+        if depth == 1:
+            return match.group(1).decode()
+    return None
+
+
+class RawRecord(dict):
+    """A record passed through as its encoded RECORD message.
+
+    The dict only holds the replication key, for the stream's bookmarks.
+    """
+
+    def __init__(self, line: bytes) -> None:
+        super().__init__()
+        self.line = line
+
+
 class WooCommerceStream(RESTStream):
     """WooCommerce stream class."""
 
     error_counter = 0
+    _record_transformer: Optional[Callable] = None
+    _record_conformer: Optional[Callable] = None
+    _record_validator: Optional[Callable] = None
+    _meta_data_filter: Optional[Callable] = None
+    _passthrough: Optional[bool] = None
+    _emitted_index: Optional[EmittedIndex] = None
+    _unchanged_keys: frozenset = frozenset()
+    _page_versions: Dict[str, str] = {}
+    _written_versions: List[Tuple[str, str]] = []
+    _index_generation = 0
+    _param_overrides: Optional[dict] = None
+    _poison_record_ids: Optional[List[Any]] = None
+    # Requests answered while bisecting, to tell broken records from an outage.
+    _bisect_answered = 0
+    _circuit_breaker: Optional[CircuitBreaker] = None
+    _latency_tracker: Optional[LatencyTracker] = None
+    _retries_used = 0
+    _schema_written = False
 
     @property
     def url_base(self) -> str:
@@ -37,7 +229,8 @@ class WooCommerceStream(RESTStream):
         headers = self.http_headers
         headers.update(self.authenticator.auth_headers or {})
         try:
-            result = self.requests_session.get(url=status_url, headers=headers)
+            request = requests.Request("GET", status_url, headers=headers).prepare()
+            result = self.send_request(request)
             result_dict = result.json()
         except:
             return True
@@ -77,12 +270,7 @@ class WooCommerceStream(RESTStream):
         It's possible that the endpoint is available, but other errors are present.
         This does not check for that possibility, that scenario is handled in the stream.
         """
-        full_path = f"{self.url_base}{self.path}"
-        response = requests.get(
-            url=full_path,
-            auth=(self.config["consumer_key"], self.config["consumer_secret"]),
-        )
-        return response.status_code != 404
+        return self.get_endpoint_status(self.path) != 404
 
     def get_next_page_token(
         self, response: requests.Response, previous_token: Optional[Any]
@@ -134,6 +322,20 @@ class WooCommerceStream(RESTStream):
                 params["after"] = (
                     self.start_date - timedelta(days=lookup_days)
                 ).isoformat()
+        return self.apply_param_overrides(params)
+
+    def apply_param_overrides(self, params: dict) -> dict:
+        """Apply the overrides of `request_window`, where None drops a parameter.
+
+        Passed-through pages are limited to the schema's properties first.
+        """
+        if self.passthrough:
+            params["_fields"] = self.passthrough_fields
+        for key, value in (self._param_overrides or {}).items():
+            if value is None:
+                params.pop(key, None)
+            else:
+                params[key] = value
         return params
 
     def _request(
@@ -147,23 +349,467 @@ class WooCommerceStream(RESTStream):
             ] = self.user_agents.get_random_user_agent()
         else:
             prepared_request.headers["User-Agent"] = self.config.get("user_agent")
-        response = self.requests_session.send(prepared_request, timeout=self.timeout)
-        if self._LOG_REQUEST_METRICS:
-            extra_tags = {}
-            if self._LOG_REQUEST_METRIC_URLS:
-                extra_tags["url"] = prepared_request.path_url
-            self._write_request_duration_log(
-                endpoint=self.path,
-                response=response,
-                context=context,
-                extra_tags=extra_tags,
-            )
-        self.validate_response(response)
+        self.check_availability()
+        try:
+            response = self.send_request(prepared_request)
+            if self._LOG_REQUEST_METRICS:
+                extra_tags = {}
+                if self._LOG_REQUEST_METRIC_URLS:
+                    extra_tags["url"] = prepared_request.path_url
+                self._write_request_duration_log(
+                    endpoint=self.path,
+                    response=response,
+                    context=context,
+                    extra_tags=extra_tags,
+                )
+            self.validate_response(response)
+        except (
+            RetriableAPIError,
+            requests.exceptions.RequestException,
+            ProtocolError,
+            RemoteDisconnected,
+        ):
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_failure()
+            raise
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success()
+        if self.latency_tracker is not None:
+            self.latency_tracker.record(response.elapsed.total_seconds())
         logging.debug("Response received successfully.")
         return response
 
+    def send_request(
+        self, prepared_request: requests.PreparedRequest
+    ) -> requests.Response:
+        """Send a request, through the tap's HTTP cassette if one is configured.
+
+        With a page spool, fresh spooled responses are returned without a
+        request, and successful GET responses are spooled.
+        """
+        spool = self._tap.page_spool
+        if spool is not None and prepared_request.method == "GET":
+            response = spool.get(prepared_request)
+            if response is not None:
+                return response
+        cassette = self._tap.http_cassette
+        if cassette is not None and cassette.mode == "replay":
+            return cassette.replay(prepared_request)
+        response = self.send_to_origin(prepared_request)
+        if cassette is not None:
+            cassette.record(prepared_request, response)
+        if spool is not None and prepared_request.method == "GET" and response.ok:
+            spool.put(prepared_request, response)
+        return response
+
+    def send_to_origin(
+        self, prepared_request: requests.PreparedRequest
+    ) -> requests.Response:
+        """Send a request to one of the configured `origins`, or to `site_url`.
+
+        Connection errors and 5xx responses count against the origin's health.
+        """
+        pool = self._tap.origin_pool
+        site_url = self.config["site_url"].rstrip("/")
+        if pool is None or not prepared_request.url.startswith(site_url):
+            return self.requests_session.send(prepared_request, timeout=self.timeout)
+        origin = pool.acquire()
+        if origin is None:
+            raise RetriableAPIError("All origins are unhealthy.")
+        # Retries resend the same prepared request, which must keep `site_url`.
+        origin_request = prepared_request.copy()
+        origin_request.url = origin.url + prepared_request.url[len(site_url) :]
+        healthy = False
+        try:
+            response = self.requests_session.send(origin_request, timeout=self.timeout)
+            healthy = response.status_code < 500
+        finally:
+            pool.release(origin, healthy)
+        return response
+
+    def get_endpoint_status(self, path: str) -> int:
+        """Return the status code of a plain GET of an endpoint."""
+        request = requests.Request(
+            "GET",
+            f"{self.url_base}{path}",
+            auth=(self.config["consumer_key"], self.config["consumer_secret"]),
+        ).prepare()
+        return self.send_request(request).status_code
+
+    @property
+    def circuit_breaker(self) -> Optional[CircuitBreaker]:
+        """Return the stream's breaker, if `circuit_breaker_threshold` is set."""
+        threshold = self.config.get("circuit_breaker_threshold")
+        if not threshold:
+            return None
+        if self._circuit_breaker is None:
+            self._circuit_breaker = CircuitBreaker(
+                threshold, self.config.get("circuit_breaker_reset", 300)
+            )
+        return self._circuit_breaker
+
+    @property
+    def latency_tracker(self) -> Optional[LatencyTracker]:
+        """Return the stream's latency tracker, if `adaptive_timeout` is set."""
+        if not self.config.get("adaptive_timeout"):
+            return None
+        if self._latency_tracker is None:
+            self._latency_tracker = LatencyTracker()
+        return self._latency_tracker
+
+    def hold_back_progress(self) -> None:
+        """Move the progress bookmark one second before the last timestamp seen.
+
+        `modified_after` is exclusive, so the records sharing the last timestamp
+        that were not synced yet are picked up by the next run.
+        """
+        markers = self.stream_state.get("progress_markers") or {}
+        value = markers.get("replication_key_value")
+        if value:
+            held_back = strptime_to_utc(value) - timedelta(seconds=1)
+            markers["replication_key_value"] = held_back.isoformat()
+
+    def start_cycle(self) -> None:
+        """Forget the retries and skipped records of the previous sync cycle."""
+        self._retries_used = 0
+        self._poison_record_ids = None
+
+    def check_availability(self) -> None:
+        """Fail fast when the stream's breaker is open or its retries are spent."""
+        retry_budget = self.config.get("retry_budget")
+        if retry_budget is not None and self._retries_used > retry_budget:
+            raise StreamUnavailableError(
+                f"{self.name} used up its retry budget of {retry_budget}."
+            )
+        breaker = self.circuit_breaker
+        if breaker is not None and not breaker.allow_request():
+            raise StreamUnavailableError(f"Circuit breaker for {self.name} is open.")
+
+    def fetch_pages(self, context: Optional[dict]) -> Iterable[Tuple[List[dict], int]]:
+        """Request records from the endpoint, yielding each page and its size."""
+        next_page_token: Any = None
+        finished = False
+        decorated_request = self.request_decorator(self._request)
+
+        while not finished:
+            prepared_request = self.prepare_request(
+                context, next_page_token=next_page_token
+            )
+            try:
+                resp = decorated_request(prepared_request, context)
+            except ServerAPIError:
+                if not self.config.get("bisect_poison_pages"):
+                    raise
+                next_page_token = yield from self.bisect_page(context, next_page_token)
+                finished = not next_page_token
+                continue
+            yield self.parse_page(resp), len(resp.content)
+            previous_token = copy.deepcopy(next_page_token)
+            next_page_token = self.get_next_page_token(
+                response=resp, previous_token=previous_token
+            )
+            if next_page_token and next_page_token == previous_token:
+                raise RuntimeError(
+                    f"Loop detected in pagination. "
+                    f"Pagination token {next_page_token} is identical to prior token."
+                )
+            finished = not next_page_token
+        if self.poison_record_ids:
+            self.logger.warning(
+                f"Skipped broken {self.name} records: {self.poison_record_ids}"
+            )
+
+    def request_window(
+        self, context: Optional[dict], overrides: dict
+    ) -> requests.Response:
+        """Request the endpoint with some URL parameters overridden."""
+        self._param_overrides = overrides
+        try:
+            prepared_request = self.prepare_request(context, next_page_token=None)
+        finally:
+            self._param_overrides = None
+        return self.request_decorator(self._request)(prepared_request, context)
+
+    def estimate_sync(self) -> dict:
+        """Estimate the requests a sync of this stream will make.
+
+        Probes the endpoint with `per_page=1` under the effective filters and
+        reads the number of matching records from `X-WP-Total`.
+        """
+        resp = self.request_window(None, {"per_page": 1})
+        total = resp.headers.get("X-WP-Total")
+        records = int(total) if total is not None else len(resp.json())
+        per_page = self.config.get("per_page", 100)
+        return {
+            "stream": self.name,
+            "records": records,
+            "requests": max(1, math.ceil(records / per_page)),
+            "latency": resp.elapsed.total_seconds(),
+        }
+
+    def estimate_child_requests(self, child_stream: RESTStream, estimate: dict) -> int:
+        """Return how many times a child stream will be synced for this stream."""
+        return estimate["records"]
+
+    def bisect_window(
+        self, context: Optional[dict], offset: int, limit: int
+    ) -> Tuple[List[dict], Optional[int]]:
+        """Fetch the records in a window, skipping the ones that cause a 5xx.
+
+        Failing windows are split in halves down to single records. Returns the
+        records and the `X-WP-Total` header of any successful request. When no
+        request succeeds in either half of a window, the endpoint is failing
+        rather than some of its records, and the error is raised.
+        """
+        try:
+            resp = self.request_window(context, {"offset": offset, "per_page": limit})
+        except ServerAPIError as error:
+            if limit > 1:
+                half = limit // 2
+                answered = self._bisect_answered
+                left, left_total = self.bisect_window(context, offset, half)
+                left_answered = self._bisect_answered > answered
+                right, right_total = self.bisect_window(
+                    context, offset + half, limit - half
+                )
+                if not left_answered and self._bisect_answered == answered:
+                    raise error
+                return left + right, left_total or right_total
+            try:
+                resp = self.request_window(
+                    context, {"offset": offset, "per_page": 1, "_fields": "id"}
+                )
+                self._bisect_answered += 1
+                record_id = resp.json()[0]["id"]
+                total = int(resp.headers["X-WP-Total"])
+            except (ServerAPIError, ValueError, LookupError):
+                record_id, total = None, None
+            self.logger.warning(
+                f"Skipping broken {self.name} record {record_id} at offset {offset}."
+            )
+            self.poison_record_ids.append(record_id)
+            return [], total
+        self._bisect_answered += 1
+        total = resp.headers.get("X-WP-Total")
+        return list(self.parse_response(resp)), int(total) if total else None
+
+    def bisect_page(self, context: Optional[dict], page_token: Optional[int]):
+        """Bisect a page that keeps failing and return the next page token.
+
+        Raises if more than `poison_max_share` of the page had to be skipped.
+        """
+        page = page_token or 1
+        per_page = self.config.get("per_page", 100)
+        self.logger.warning(f"Page {page} of {self.name} keeps failing, bisecting.")
+        skipped = len(self.poison_record_ids)
+        records, total = self.bisect_window(context, (page - 1) * per_page, per_page)
+        skipped = len(self.poison_record_ids) - skipped
+        if skipped > per_page * self.config.get("poison_max_share", 0.5):
+            raise ServerAPIError(
+                f"{skipped} of {per_page} {self.name} records on page {page} failed."
+            )
+        yield records, 0
+        if total is None:
+            self.logger.warning(f"Could not tell how many {self.name} pages remain.")
+            return None
+        return page + 1 if page * per_page < total else None
+
+    @property
+    def poison_record_ids(self) -> List[Any]:
+        """Return the IDs of records skipped because they broke their page."""
+        if self._poison_record_ids is None:
+            self._poison_record_ids = []
+        return self._poison_record_ids
+
+    def request_pages(self, context: Optional[dict]) -> Iterable[List[dict]]:
+        """Request records from the endpoint, yielding one list of records per page.
+
+        With `prefetch_pages` set, top-level streams fetch the next pages in a
+        background thread while the current page is emitted. Top-level streams
+        stop between pages when the tap's scheduler tells them to yield.
+        """
+        if self.config.get("prefetch_pages") and context is None:
+            pages = self.prefetch_pages(context)
+        else:
+            pages = (page for page, _ in self.fetch_pages(context))
+        for page in pages:
+            yield page
+            if context is None:
+                self.check_deadline()
+
+    def check_deadline(self) -> None:
+        """Raise `DeadlineReached` if the tap's scheduler tells the stream to yield."""
+        scheduler = self._tap.scheduler
+        if scheduler and scheduler.should_yield(self.name):
+            raise DeadlineReached(f"{self.name} yields to the run deadline.")
+
+    def prefetch_pages(self, context: Optional[dict]) -> Iterable[List[dict]]:
+        """Yield pages fetched ahead by a producer thread.
+
+        Pages wait in the tap's memory budget, so a slow target stalls the
+        producer instead of letting fetched pages pile up. A page counts as
+        the size of its response body; its decoded records take several
+        times as much memory.
+        """
+        budget = self._tap.memory_budget
+        pages: queue.Queue = queue.Queue()
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce_pages, args=(context, pages, stop), daemon=True
+        )
+        producer.start()
+        item = None
+        try:
+            while True:
+                item = pages.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                page, size = item
+                try:
+                    yield page
+                finally:
+                    budget.release(size)
+        finally:
+            # Unblock the producer and give back the budget of unread pages.
+            stop.set()
+            while item is not None:
+                item = pages.get()
+                if isinstance(item, tuple):
+                    budget.release(item[1])
+            producer.join()
+
+    def _produce_pages(
+        self, context: Optional[dict], pages: queue.Queue, stop: threading.Event
+    ) -> None:
+        """Fetch pages into a queue until done or stopped, ending with None."""
+        budget = self._tap.memory_budget
+        try:
+            for page, size in self.fetch_pages(context):
+                budget.acquire(size)
+                pages.put((page, size))
+                if stop.is_set():
+                    break
+        except Exception as e:
+            pages.put(e)
+        finally:
+            pages.put(None)
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Request records from the endpoint, flattening the pages."""
+        for page in self.request_pages(context):
+            yield from page
+
+    @property
+    def meta_data_filter(self) -> Optional[Callable]:
+        """Return the `meta_data` filter configured for this stream, if any."""
+        include = self.config.get("meta_data_include", {}).get(self.name)
+        exclude = self.config.get("meta_data_exclude", {}).get(self.name)
+        max_value_length = self.config.get("meta_data_max_value_length")
+        if not (include or exclude or max_value_length):
+            return None
+        if self._meta_data_filter is None:
+            self._meta_data_filter = meta_data_filter(
+                include, exclude, max_value_length
+            )
+        return self._meta_data_filter
+
     def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        """Parse the response and return an iterator of result rows."""
+        """Parse the response and return an iterator of result rows.
+
+        Unwanted `meta_data` is dropped here, before any other processing.
+        """
+        records = self.extract_records(response)
+        meta_data_filter = self.meta_data_filter
+        if meta_data_filter is None:
+            yield from records
+            return
+        for record in records:
+            meta_data_filter(record)
+            yield record
+
+    @property
+    def passthrough(self) -> bool:
+        """Return whether pages are passed through without decoding records.
+
+        Only for `passthrough_streams` whose records need nothing but their
+        bookmark: no property deselected, no child streams, stream maps,
+        batches, emitted index, reference snapshot cache, `meta_data` filter or
+        old-version date check, and no record fix-up, page transform or child
+        context of their own.
+        """
+        if self._passthrough is None:
+            self._passthrough = (
+                self.name in self.config.get("passthrough_streams", [])
+                and self.passthrough_safe()
+                and self.new_version is not False
+                and all(self.mask.values())
+                and not self.has_selected_descendents
+                and not self.config.get("stream_maps")
+                and self._tap.batch_writer is None
+                and self.emitted_index is None
+                and self.meta_data_filter is None
+            )
+        return self._passthrough
+
+    def passthrough_safe(self) -> bool:
+        """Return whether the stream's records can be emitted as the API sends them.
+
+        Streams deriving anything from their records, such as the orders
+        feeding their line items, always decode them.
+        """
+        stream_class = type(self)
+        if (
+            stream_class.get_child_context is not RESTStream.get_child_context
+            or stream_class.transform_page is not WooCommerceStream.transform_page
+            or len(self.get_record_fixups()) > bool(self.replication_key)
+        ):
+            self.logger.warning(f"Stream {self.name} cannot be passed through.")
+            return False
+        return True
+
+    @property
+    def passthrough_fields(self) -> str:
+        """Return the `_fields` limiting a passed-through page to the schema."""
+        return ",".join(
+            name for name in self.schema["properties"] if not name.startswith("_sdc_")
+        )
+
+    def parse_page(self, response: requests.Response) -> List[dict]:
+        """Return the records of a page, as `RawRecord`s in passthrough mode."""
+        if self.passthrough and response.status_code < 400:
+            return self.raw_records(response.content)
+        return list(self.parse_response(response))
+
+    def raw_records(self, body: bytes) -> List[dict]:
+        """Wrap the records of a page in RECORD messages without decoding them."""
+        prefix = b'{"type": "RECORD", "stream": %s, "record": ' % json.dumps(
+            self.name
+        ).encode()
+        suffix = b', "time_extracted": "%s"}\n' % strftime(utc_now()).encode()
+        replication_key = self.replication_key
+        if replication_key:
+            patterns = [
+                re.compile(rb'"%s"\s*:\s*"([^"]*)"' % key.encode())
+                for key in (replication_key, "date_created")
+            ]
+        records = []
+        for span in split_records(body):
+            record = RawRecord(prefix + span + suffix)
+            if replication_key:
+                # Same fallback as `default_replication_key`.
+                record[replication_key] = "1970-01-01T00:00:00"
+                for pattern in patterns:
+                    value = top_level_value(span, pattern)
+                    if value is not None:
+                        record[replication_key] = value
+                        break
+            records.append(record)
+        return records
+
+    def extract_records(self, response: requests.Response) -> Iterable[dict]:
+        """Return the records of a response newer than the start date."""
         if response.status_code >= 400 and self.config.get("ignore_server_errors"):
             return []
         if self.replication_key and not self.new_version:
@@ -197,11 +843,25 @@ class WooCommerceStream(RESTStream):
             raise FatalAPIError(
                 f"Unauthorized: {response.status_code} {response.reason} at {self.path}"
             )
-        if response.status_code >= 400 and self.config.get("ignore_server_errors"):
+        if (
+            response.status_code >= 400
+            and self.config.get("ignore_server_errors")
+            and not (
+                self.config.get("bisect_poison_pages")
+                and 500 <= response.status_code < 600
+            )
+        ):
             self.error_counter += 1
             # NOTE: We return because there's no need for further validation
             return
-        elif 500 <= response.status_code < 600 or response.status_code in [
+        elif 500 <= response.status_code < 600:
+            msg = (
+                f"{response.status_code} Server Error: "
+                f"{response.reason} for path: {self.path}"
+                f"Response: {response.text}"
+            )
+            raise ServerAPIError(msg)
+        elif response.status_code in [
             429,
             403,
             104,
@@ -224,7 +884,24 @@ class WooCommerceStream(RESTStream):
             raise RetriableAPIError(f"Invalid JSON: {response.text}")
 
     def request_decorator(self, func: Callable) -> Callable:
-        """Instantiate a decorator for handling request failures."""
+        """Instantiate a decorator for handling request failures.
+
+        With `bisect_poison_pages`, server errors are only retried
+        `poison_page_retries` times before the page gets bisected.
+        """
+        bisect = self.config.get("bisect_poison_pages")
+        if bisect:
+            func = backoff.on_exception(
+                backoff.expo,
+                ServerAPIError,
+                max_tries=self.config.get("poison_page_retries", 3),
+                on_backoff=self.backoff_handler,
+            )(func)
+
+        def giveup(e: Exception) -> bool:
+            # Server errors were already retried by the inner decorator.
+            return bool(bisect) and isinstance(e, ServerAPIError)
+
         decorator: Callable = backoff.on_exception(
             backoff.expo,
             (
@@ -237,6 +914,7 @@ class WooCommerceStream(RESTStream):
             ),
             max_tries=10,
             factor=4,
+            giveup=giveup,
             on_backoff=self.backoff_handler,
         )(func)
         return decorator
@@ -247,33 +925,165 @@ class WooCommerceStream(RESTStream):
                 if child_context:
                     child_stream.sync(context=child_context)
 
+    def get_record_fixups(self) -> List[Callable]:
+        """Return the in-place fix-ups this stream applies to every record.
+
+        Only fix-ups for fields present in the schema are returned, anything
+        else is dropped by schema conformance anyway.
+        """
+        properties = self.schema["properties"]
+        fixups = []
+        if self.replication_key:
+            fixups.append(default_replication_key(self.replication_key))
+        if "parent_id" in properties:
+            fixups.append(coerce_parent_id)
+        if "price" in properties:
+            fixups.append(stringify_bool_price)
+        return fixups
+
+    @property
+    def record_transformer(self) -> Callable:
+        """Return the record transformer, built once per stream."""
+        if self._record_transformer is None:
+            fixups = tuple(self.get_record_fixups())
+
+            def transform(row: dict, context: Optional[dict]) -> Optional[dict]:
+                for fixup in fixups:
+                    fixup(row, context)
+                return row
+
+            self._record_transformer = transform
+        return self._record_transformer
+
+    def transform_page(
+        self, records: List[dict], context: Optional[dict]
+    ) -> List[dict]:
+        """Apply the record transformer to a whole page of records."""
+        transform = self.record_transformer
+        transformed = [transform(record, context) for record in records]
+        return [record for record in transformed if record is not None]
+
     def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
-        if row.get(self.replication_key) is None:
-            if row.get("date_created"):
-                row[self.replication_key] = row["date_created"]
+        return self.record_transformer(row, context)
+
+    @property
+    def record_conformer(self) -> Callable:
+        """Return a schema conformer specialized for this stream's schema.
+
+        Equivalent to popping deselected properties and running the SDK's
+        `conform_record_data_types`, but the selection mask and boolean properties
+        are resolved once and plain JSON values skip the type checks.
+        """
+        if self._record_conformer is None:
+            if self.name in self.config.get("trusted_streams", []):
+                self._record_conformer = self._trusted_conformer()
+                return self._record_conformer
+            schema = self.schema
+            properties = schema["properties"]
+            boolean_properties = frozenset(
+                name for name, prop in properties.items() if is_boolean_type(prop)
+            )
+            name, logger, mask = self.name, self.logger, self.mask
+            has_deselected = not all(mask.values())
+
+            def conform(row: dict) -> dict:
+                if has_deselected:
+                    pop_deselected_record_properties(row, schema, mask, logger)
+                rec = {}
+                for key, elem in row.items():
+                    if key not in properties:
+                        _warn_unmapped_property(name, key, logger)
+                    elif type(elem) not in PLAIN_TYPES:
+                        rec.update(
+                            conform_record_data_types(name, {key: elem}, schema, logger)
+                        )
+                    elif key in boolean_properties and elem is not None:
+                        rec[key] = elem != 0
+                    else:
+                        rec[key] = elem
+                return rec
+
+            self._record_conformer = conform
+        return self._record_conformer
+
+    def _trusted_conformer(self) -> Callable:
+        """Return a conformer that trusts the API to match the schema.
+
+        Values are not type-checked, unmapped properties are dropped silently and
+        only the replication key fallback date needs serializing.
+        """
+        schema, logger, mask = self.schema, self.logger, self.mask
+        properties = schema["properties"]
+        replication_key = self.replication_key
+        has_deselected = not all(mask.values())
+
+        def conform(row: dict) -> dict:
+            if has_deselected:
+                pop_deselected_record_properties(row, schema, mask, logger)
+            rec = {key: elem for key, elem in row.items() if key in properties}
+            if replication_key and isinstance(rec.get(replication_key), datetime):
+                rec[replication_key] = to_json_compatible(rec[replication_key])
+            return rec
+
+        return conform
+
+    @property
+    def record_validator(self) -> Callable:
+        """Return a validator for this stream's schema, compiled once.
+
+        Uses `fastjsonschema` when it is installed, otherwise the `jsonschema`
+        Draft 4 validator. Both return a list of error messages.
+        """
+        if self._record_validator is None:
+            if fastjsonschema is not None:
+                compiled = fastjsonschema.compile(self.schema, use_formats=False)
+
+                def validate(record: dict) -> List[str]:
+                    try:
+                        compiled(record)
+                    except fastjsonschema.JsonSchemaException as e:
+                        return [e.message]
+                    return []
+
             else:
-                row[self.replication_key] = datetime(1970, 1, 1)
+                validator = Draft4Validator(self.schema)
 
-        if "parent_id" in row:
-            try:
-                row["parent_id"] = int(row["parent_id"])
-            except:
-                row["parent_id"] = 0
+                def validate(record: dict) -> List[str]:
+                    return [e.message for e in validator.iter_errors(record)]
 
-        if "price" in row:
-            if isinstance(row["price"], bool):
-                row["price"] = str(row["price"])
-        return row
+            self._record_validator = validate
+        return self._record_validator
+
+    def _generate_record_messages(self, record: dict) -> Iterable[RecordMessage]:
+        record = self.record_conformer(record)
+        if self.config.get("validate_records"):
+            for error in self.record_validator(record):
+                self.logger.warning(
+                    f"Record {record.get('id')} in {self.name} does not match "
+                    f"the schema: {error}"
+                )
+        for stream_map in self.stream_maps:
+            mapped_record = stream_map.transform(record)
+            if mapped_record is not None:
+                yield RecordMessage(
+                    stream=stream_map.stream_alias,
+                    record=mapped_record,
+                    version=None,
+                    time_extracted=utc_now(),
+                )
 
     @property
-    def timeout(self) -> int:
+    def timeout(self) -> float:
         """Return the request timeout limit in seconds.
 
-        The default timeout is 300 seconds, or as defined by DEFAULT_REQUEST_TIMEOUT.
+        The default timeout is 500 seconds. With `adaptive_timeout`, it is derived
+        from the latencies observed on this stream.
 
         Returns:
             The request timeout limit as number of seconds.
         """
+        if self.latency_tracker is not None:
+            return self.latency_tracker.timeout()
         return 500
 
     def backoff_handler(self, details) -> None:
@@ -286,19 +1096,378 @@ class WooCommerceStream(RESTStream):
             details: backoff invocation details
                 https://github.com/litl/backoff#event-handlers
         """
+        self._retries_used += 1
         logging.info(
             "Backing off {wait:0.1f} seconds after {tries} tries "
             "calling function {target} with args {args} and kwargs "
             "{kwargs}".format(**details)
         )
 
+    @property
+    def emitted_index(self) -> Optional[EmittedIndex]:
+        """Return the emitted-record index, if `emitted_index_path` is configured.
+
+        The generation the incoming state confirmed is read on first use, and
+        index entries written after it are discarded.
+        """
+        if not (self._tap.emitted_index and self.primary_keys and self.selected):
+            return None
+        if self._emitted_index is None:
+            self._emitted_index = self._tap.emitted_index
+            confirmed = self.stream_state.get("emitted_index_generation", 0)
+            self._emitted_index.discard_unconfirmed(self.name, confirmed)
+            self._index_generation = confirmed + 1
+            self._written_versions = []
+        return self._emitted_index
+
+    def get_record_key(self, record: dict) -> str:
+        """Return the primary key of a record as a single string."""
+        return "|".join(str(record.get(key)) for key in self.primary_keys)
+
+    def index_page(self, records: List[dict]) -> None:
+        """Find the page records emitted before, unchanged ones are not written."""
+        self._page_versions = {
+            self.get_record_key(record): record_version(record, self.replication_key)
+            for record in records
+        }
+        emitted = self.emitted_index.lookup(self.name, list(self._page_versions))
+        self._unchanged_keys = frozenset(
+            key
+            for key, version in self._page_versions.items()
+            if emitted.get(key) == version
+        )
+
+    def forget_page(self) -> None:
+        """Write the next records regardless of the indexed page."""
+        self._page_versions = {}
+        self._unchanged_keys = frozenset()
+
+    @property
+    def STATE_MSG_FREQUENCY(self) -> int:
+        """Return the number of records between STATE messages."""
+        return self.config.get("state_every_records", 10000)
+
+    @property
+    def message_writer(self) -> MessageWriter:
+        """Return the writer of the tap this stream belongs to."""
+        return self._tap.message_writer
+
+    def _write_schema_message(self) -> None:
+        # Child streams are synced once per parent record, the schema is
+        # only sent the first time.
+        if self._schema_written:
+            return
+        for schema_message in self._generate_schema_messages():
+            self.message_writer.write_message(schema_message)
+        self._schema_written = True
+
+    def _write_record_message(self, record: dict) -> None:
+        if isinstance(record, RawRecord):
+            self.message_writer.write_line(record.line)
+            return
+        key = self.get_record_key(record) if self._page_versions else None
+        if key in self._unchanged_keys:
+            return
+        batch_writer = self._tap.batch_writer
+        for record_message in self._generate_record_messages(record):
+            if batch_writer is None:
+                self.message_writer.write_message(record_message)
+            elif batch_writer.write(record_message):
+                batch_writer.flush()
+        if key in self._page_versions:
+            self._written_versions.append((key, self._page_versions[key]))
+
+    def _write_state_message(self) -> None:
+        if self._emitted_index is not None:
+            # The index entries only count once a state with their generation
+            # comes back in.
+            self.stream_state["emitted_index_generation"] = self._index_generation
+            self._emitted_index.write(
+                self.name, self._written_versions, self._index_generation
+            )
+            self._written_versions = []
+            self._index_generation += 1
+        self._tap.write_state_message(self)
+
+    def list_all(self, fields: str) -> Optional[List[dict]]:
+        """Page through some fields of all records, ignoring the bookmark filters.
+
+        Returns None if any page failed, as the listing would be incomplete.
+        """
+        overrides = {
+            "_fields": fields,
+            "per_page": 100,
+            "orderby": "id",
+            "modified_after": None,
+            "after": None,
+        }
+        records: List[dict] = []
+        page, total_pages = 1, 1
+        while page <= total_pages:
+            resp = self.request_window(None, {**overrides, "page": page})
+            if resp.status_code >= 400:
+                return None
+            records.extend(resp.json())
+            total_pages = int(resp.headers.get("X-WP-TotalPages", 1))
+            page += 1
+        return records
+
+    def fetch_all_ids(self) -> Optional[List[int]]:
+        """Return the IDs of all records, or None if the listing failed."""
+        records = self.list_all("id")
+        return None if records is None else [record["id"] for record in records]
+
+    def confirm_deleted(self, candidate_ids: List[int]) -> Optional[List[int]]:
+        """Return the candidates that `include=` still does not find.
+
+        Makes one request per 100 candidates. Returns None if a request failed.
+        """
+        deleted_ids = []
+        for start in range(0, len(candidate_ids), 100):
+            chunk = candidate_ids[start : start + 100]
+            resp = self.request_window(
+                None,
+                {
+                    "include": ",".join(str(record_id) for record_id in chunk),
+                    "_fields": "id",
+                    "per_page": len(chunk),
+                    "page": None,
+                    "modified_after": None,
+                    "after": None,
+                },
+            )
+            if resp.status_code >= 400:
+                return None
+            found = {record["id"] for record in resp.json()}
+            deleted_ids.extend(sorted(set(chunk) - found))
+        return deleted_ids
+
+    def ignores_modified_after(self) -> bool:
+        """Return whether the endpoint ignores the `modified_after` filter.
+
+        Probed once by comparing `X-WP-Total` with and without a filter on a
+        date far in the future; the result is kept in the stream's state. When
+        a probe fails, the filter is assumed to work and probed again next time.
+        """
+        if self.new_version is None:
+            self.new_version = self.get_wc_version()
+        if not self.new_version:
+            # Old versions filter on `after` and by date in `parse_response`.
+            return False
+        state = self.stream_state
+        if "modified_after_supported" not in state:
+            supported = self.probe_modified_after()
+            if supported is None:
+                return False
+            state["modified_after_supported"] = supported
+            if not supported:
+                self.logger.warning(
+                    f"{self.name} ignores `modified_after`, only fetching records "
+                    f"whose `{self.replication_key}` changed."
+                )
+        return not state["modified_after_supported"]
+
+    def probe_modified_after(self) -> Optional[bool]:
+        """Return whether `modified_after` filters records, or None if unknown."""
+        try:
+            unfiltered = self.request_window(
+                None, {"per_page": 1, "modified_after": None}
+            )
+            total = int(unfiltered.headers.get("X-WP-Total", 0))
+            if unfiltered.status_code >= 400 or total < 2:
+                # Too few records to tell.
+                return None
+            # A fixed date keeps the probe the same request on every run.
+            filtered = self.request_window(
+                None, {"per_page": 1, "modified_after": "2100-01-01T00:00:00"}
+            )
+        except (RetriableAPIError, FatalAPIError, requests.RequestException) as e:
+            self.logger.warning(f"Could not probe `modified_after` on {self.name}: {e}")
+            return None
+        if filtered.status_code >= 400 or "X-WP-Total" not in filtered.headers:
+            return None
+        return int(filtered.headers["X-WP-Total"]) < total
+
+    def request_changed_pages(self) -> Iterable[List[dict]]:
+        """Yield pages of the records modified after the bookmark.
+
+        For endpoints ignoring `modified_after`: lists the id and replication
+        key of all records, then fetches the changed ones with `include`, in
+        order of modification. Stops between pages like `request_pages`.
+        """
+        listing = self.list_all(f"id,{self.replication_key}")
+        if listing is None:
+            self.logger.warning(f"Could not list {self.name}, doing a full scan.")
+            for page, _ in self.fetch_pages(None):
+                yield page
+                self.check_deadline()
+            return
+        start_date = self.start_date.isoformat()
+        changed = sorted(
+            (
+                record
+                for record in listing
+                if not record.get(self.replication_key)
+                or record[self.replication_key] > start_date
+            ),
+            key=lambda record: record.get(self.replication_key) or "",
+        )
+        self.logger.info(f"{len(changed)} of {len(listing)} {self.name} changed.")
+        for start in range(0, len(changed), 100):
+            ids = [str(record["id"]) for record in changed[start : start + 100]]
+            resp = self.request_window(
+                None,
+                {"include": ",".join(ids), "per_page": 100, "modified_after": None},
+            )
+            yield list(self.parse_response(resp))
+            self.check_deadline()
+
+    def reconcile_deletes(self) -> None:
+        """Emit deletion markers for records that disappeared since last time.
+
+        The IDs from the previous reconciliation are kept in the SQLite file
+        `reconcile_path`, under the generation stored in the stream's state.
+        Markers carry only `id` and `_sdc_deleted_at`.
+        """
+        if not self.selected or "_sdc_deleted_at" not in self.schema["properties"]:
+            return
+        id_set = IdSet(
+            self.config.get("reconcile_path", "reconcile.db"),
+            self.name,
+            self.stream_state.get("reconcile_generation", 0),
+        )
+        ids = self.fetch_all_ids()
+        if ids is None:
+            self.logger.warning(f"Could not list all {self.name} IDs, not reconciling.")
+            return
+        id_set.add_current(ids)
+        missing_ids = id_set.missing_ids()
+        deleted_ids = self.confirm_deleted(missing_ids)
+        if deleted_ids is None:
+            self.logger.warning(f"Could not recheck {self.name} IDs, not reconciling.")
+            return
+        # Records can move between pages while they are listed.
+        id_set.add_current(set(missing_ids) - set(deleted_ids))
+        self.logger.info(f"Found {len(deleted_ids)} deleted {self.name}.")
+        self.forget_page()
+        deleted_at = utc_now().isoformat()
+        for record_id in deleted_ids:
+            self._write_record_message({"id": record_id, "_sdc_deleted_at": deleted_at})
+        # The new listing only counts once a state with its generation comes back.
+        self.stream_state["reconcile_generation"] = id_set.commit_current()
+
     def get_records(self, context: Optional[dict]):
         sync_products = self.config.get("sync_products", True)
         if self.name == "products" and sync_products == False:
             pass
         else:
-            for record in self.request_records(context):
-                transformed_record = self.post_process(record, context)
-                if transformed_record is None:
-                    continue
-                yield transformed_record
+            pages = self.request_pages(context)
+            if (
+                context is None
+                and self.replication_key
+                and self.config.get("probe_filters", True)
+                and self.ignores_modified_after()
+            ):
+                pages = self.request_changed_pages()
+            for page in pages:
+                records = page
+                if not (page and isinstance(page[0], RawRecord)):
+                    records = self.transform_page(page, context)
+                if self.emitted_index is not None:
+                    self.index_page(records)
+                yield from records
+                if context is None and self.config.get("state_every_page"):
+                    # The SDK has counted the whole page by the time it asks
+                    # for the next one.
+                    self._write_state_message()
+            reconciled = self.config.get("reconcile_deletes", [])
+            if context is None and self.name in reconciled:
+                self.reconcile_deletes()
+            if context is None and self._tap.batch_writer is not None:
+                # Complete the batches of this stream and its children.
+                self._tap.batch_writer.flush()
+
+
+class ReferenceDataStream(WooCommerceStream):
+    """Full-table stream of rarely changing store data.
+
+    With `reference_cache_path` set, the stream is skipped entirely while its
+    snapshot is younger than `reference_cache_ttl` seconds, and its records are
+    only emitted when their content hash changed since the last fetch. The
+    hash is also kept in the stream's state, and a snapshot is only trusted
+    when the incoming state carries its hash: a snapshot whose records never
+    reached the target is ignored.
+    """
+
+    replication_key = None
+    _snapshot_cache: Optional[SnapshotCache] = None
+
+    @property
+    def snapshot_cache(self) -> Optional[SnapshotCache]:
+        cache_path = self.config.get("reference_cache_path")
+        if not cache_path:
+            return None
+        if self._snapshot_cache is None:
+            self._snapshot_cache = SnapshotCache(
+                cache_path, self.config.get("reference_cache_ttl", 86400)
+            )
+        return self._snapshot_cache
+
+    def confirmed_snapshot(self) -> Optional[dict]:
+        """Return the stream's snapshot if the incoming state confirms it."""
+        snapshot = self.snapshot_cache.load(self.name)
+        if snapshot and snapshot["hash"] == self.stream_state.get("snapshot_hash"):
+            return snapshot
+        return None
+
+    def estimate_sync(self) -> dict:
+        cache = self.snapshot_cache
+        if cache is not None and cache.is_fresh(self.confirmed_snapshot()):
+            return {"stream": self.name, "records": 0, "requests": 0, "latency": 0}
+        return super().estimate_sync()
+
+    def passthrough_safe(self) -> bool:
+        """Return whether records can be passed through, never with a snapshot.
+
+        The snapshot hash is computed from the decoded records.
+        """
+        if self.snapshot_cache is not None:
+            self.logger.warning(
+                f"Stream {self.name} cannot be passed through with a snapshot cache."
+            )
+            return False
+        return super().passthrough_safe()
+
+    def check_endpoint_exists(self) -> bool:
+        """Reference endpoints need elevated permissions, skip them without."""
+        return self.get_endpoint_status(self.path) not in [401, 403, 404]
+
+    def get_url_params(
+        self, context: Optional[dict], next_page_token: Optional[Any]
+    ) -> Dict[str, Any]:
+        # Reference endpoints reject `orderby=modified` and need no version check.
+        params: dict = {}
+        params["per_page"] = 100
+        params["consumer_key"] = (self.config.get("consumer_key"),)
+        params["consumer_secret"] = (self.config.get("consumer_secret"),)
+        if next_page_token:
+            params["page"] = next_page_token
+        return self.apply_param_overrides(params)
+
+    def get_records(self, context: Optional[dict]):
+        cache = self.snapshot_cache
+        if cache is None:
+            yield from super().get_records(context)
+            return
+        snapshot = self.confirmed_snapshot()
+        if cache.is_fresh(snapshot):
+            self.logger.info(f"Snapshot of {self.name} is fresh, skipping.")
+            return
+        records = list(super().get_records(context))
+        digest = content_hash(records)
+        if snapshot and snapshot["hash"] == digest:
+            self.logger.info(f"{self.name} is unchanged since the last snapshot.")
+        else:
+            yield from records
+        cache.save(self.name, digest)
+        self.stream_state["snapshot_hash"] = digest
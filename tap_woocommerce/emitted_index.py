@@ -0,0 +1,82 @@
+"""On-disk index of emitted records, used to suppress unchanged re-emission."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+def content_hash(value: Any) -> str:
+    """Return a stable hash of a JSON-like value."""
+    content = json.dumps(value, sort_keys=True, default=str).encode()
+    return hashlib.sha1(content).hexdigest()
+
+
+def record_version(record: dict, replication_key: str = None) -> str:
+    """Return the version of a record: its replication key or a content hash."""
+    if replication_key and record.get(replication_key) is not None:
+        return str(record[replication_key])
+    return content_hash(record)
+
+
+class EmittedIndex:
+    """Map of (stream, primary key) to the version last emitted.
+
+    The index lives in a SQLite file so memory use does not grow with the
+    stream size, and one connection is shared by all streams of a tap. Entries
+    are written together with a STATE message and tagged with a generation
+    number that the stream also stores in its state. Entries of generations
+    the incoming state does not know about belong to messages that never
+    reached the target, and are discarded before the stream runs again.
+    """
+
+    # SQLite limits the number of bound parameters per statement.
+    lookup_chunk_size = 500
+
+    def __init__(self, path: str) -> None:
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS emitted ("
+            "stream TEXT NOT NULL, pk TEXT NOT NULL, version TEXT NOT NULL, "
+            "generation INTEGER NOT NULL, PRIMARY KEY (stream, pk)) WITHOUT ROWID"
+        )
+        self.connection.commit()
+
+    def discard_unconfirmed(self, stream_name: str, generation: int) -> None:
+        """Remove the entries of a stream newer than its confirmed generation."""
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM emitted WHERE stream = ? AND generation > ?",
+                [stream_name, generation],
+            )
+            self.connection.commit()
+
+    def lookup(self, stream_name: str, keys: List[str]) -> Dict[str, str]:
+        """Return the emitted version for each of the keys that were emitted."""
+        versions: Dict[str, str] = {}
+        with self.lock:
+            for start in range(0, len(keys), self.lookup_chunk_size):
+                end = start + self.lookup_chunk_size
+                chunk = keys[start:end]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.connection.execute(
+                    f"SELECT pk, version FROM emitted "
+                    f"WHERE stream = ? AND pk IN ({placeholders})",
+                    [stream_name, *chunk],
+                )
+                versions.update(rows)
+        return versions
+
+    def write(
+        self, stream_name: str, entries: Iterable[Tuple[str, str]], generation: int
+    ) -> None:
+        """Persist the (key, version) pairs of records that were emitted."""
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO emitted (stream, pk, version, generation) "
+                "VALUES (?, ?, ?, ?)",
+                ((stream_name, key, version, generation) for key, version in entries),
+            )
+            self.connection.commit()
@@ -0,0 +1,63 @@
+"""On-disk sets of record IDs, used to detect deleted records."""
+
+import sqlite3
+from typing import Iterable, List
+
+
+class IdSet:
+    """The IDs a stream had at its last reconciliation, kept in SQLite.
+
+    Every listing is stored under a generation number that the stream also
+    stores in its state. Only the listing of the generation the incoming state
+    confirmed is compared against: later ones belong to runs whose deletion
+    markers may never have reached the target, and are discarded.
+    """
+
+    def __init__(self, path: str, stream_name: str, generation: int) -> None:
+        self.stream_name = stream_name
+        self.generation = generation
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS listed_ids ("
+            "stream TEXT NOT NULL, generation INTEGER NOT NULL, id INTEGER NOT NULL, "
+            "PRIMARY KEY (stream, generation, id)) WITHOUT ROWID"
+        )
+        self.connection.execute(
+            "DELETE FROM listed_ids WHERE stream = ? AND generation <> ?",
+            [stream_name, generation],
+        )
+        self.connection.execute(
+            "CREATE TEMP TABLE current_ids (id INTEGER PRIMARY KEY)"
+        )
+        self.connection.commit()
+
+    def add_current(self, ids: Iterable[int]) -> None:
+        """Add IDs seen by the running reconciliation."""
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO current_ids (id) VALUES (?)",
+            ((record_id,) for record_id in ids),
+        )
+
+    def missing_ids(self) -> List[int]:
+        """Return the IDs of the confirmed listing that were not seen this time."""
+        rows = self.connection.execute(
+            "SELECT id FROM listed_ids WHERE stream = ? AND generation = ? "
+            "AND id NOT IN (SELECT id FROM current_ids)",
+            [self.stream_name, self.generation],
+        )
+        return [row[0] for row in rows]
+
+    def commit_current(self) -> int:
+        """Store the IDs seen this time as the next generation and return it.
+
+        The confirmed listing is kept until a state with the new generation
+        comes back in.
+        """
+        self.connection.execute(
+            "INSERT INTO listed_ids (stream, generation, id) "
+            "SELECT ?, ?, id FROM current_ids",
+            [self.stream_name, self.generation + 1],
+        )
+        self.connection.execute("DELETE FROM current_ids")
+        self.connection.commit()
+        return self.generation + 1
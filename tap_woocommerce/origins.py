@@ -0,0 +1,89 @@
+"""Spreading requests over several origins serving the same store."""
+
+import random
+import threading
+from typing import List, Optional
+
+from tap_woocommerce.resilience import CircuitBreaker
+
+
+class Origin:
+    """A base URL serving the store, with its own concurrency limit and health."""
+
+    def __init__(
+        self, url: str, weight: float, max_concurrency: int, breaker: CircuitBreaker
+    ) -> None:
+        self.url = url.rstrip("/")
+        self.weight = weight
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.breaker = breaker
+
+
+class OriginPool:
+    """Picks an origin for every request.
+
+    Origins are tried in a random order weighted by `weight`, preferring one
+    with a free slot. An origin failing `failure_threshold` requests in a row
+    is dropped for `cooldown` seconds, then a single request checks whether it
+    recovered.
+    """
+
+    def __init__(self, origins: List[Origin]) -> None:
+        self.origins = origins
+        self.slot_freed = threading.Condition()
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["OriginPool"]:
+        """Return a pool of the configured `origins`, if any."""
+        if not config.get("origins"):
+            return None
+        return cls(
+            [
+                Origin(
+                    origin["url"],
+                    origin.get("weight", 1),
+                    origin.get("max_concurrency", 4),
+                    CircuitBreaker(
+                        config.get("origin_failure_threshold", 3),
+                        config.get("origin_cooldown", 60),
+                    ),
+                )
+                for origin in config["origins"]
+            ]
+        )
+
+    def acquire(self) -> Optional[Origin]:
+        """Return a healthy origin holding one of its slots, or None if all are down.
+
+        Blocks while every healthy origin is at its concurrency limit, until a
+        slot of any origin is released.
+        """
+        with self.slot_freed:
+            while True:
+                # Weighted random order: higher weights tend to come first.
+                ordered = sorted(
+                    self.origins,
+                    key=lambda origin: -random.random() ** (1 / origin.weight),
+                )
+                full = False
+                for origin in ordered:
+                    if not origin.slots.acquire(blocking=False):
+                        full = True
+                    elif origin.breaker.allow_request():
+                        return origin
+                    else:
+                        origin.slots.release()
+                if not full:
+                    return None
+                # A full origin may also be down, which only its release tells.
+                self.slot_freed.wait()
+
+    def release(self, origin: Origin, healthy: bool) -> None:
+        """Give back an origin's slot and record the outcome of its request."""
+        if healthy:
+            origin.breaker.record_success()
+        else:
+            origin.breaker.record_failure()
+        with self.slot_freed:
+            origin.slots.release()
+            self.slot_freed.notify()
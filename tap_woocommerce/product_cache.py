@@ -0,0 +1,95 @@
+"""Product lookup cache used to enrich order lines."""
+
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List
+
+
+def product_summary(product: dict) -> dict:
+    """Return the fields of a product or variation kept in the cache."""
+    return {
+        "id": product["id"],
+        "sku": product.get("sku"),
+        "type": product.get("type") or "variation",
+        "parent_id": product.get("parent_id"),
+        "categories": [
+            {"id": category.get("id"), "name": category.get("name")}
+            for category in product.get("categories") or []
+        ],
+    }
+
+
+def missing_summary(product_id: int) -> dict:
+    """Return the summary cached for a product or variation that was not found."""
+    return {
+        "id": product_id,
+        "sku": None,
+        "type": None,
+        "parent_id": None,
+        "categories": None,
+    }
+
+
+class MemoryProductCache:
+    """Least recently used products, kept in memory."""
+
+    def __init__(self, max_size: int = 10000) -> None:
+        self.max_size = max_size
+        self.products: "OrderedDict[int, dict]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, product_ids: Iterable[int]) -> Dict[int, dict]:
+        found = {}
+        with self.lock:
+            for product_id in product_ids:
+                if product_id in self.products:
+                    self.products.move_to_end(product_id)
+                    found[product_id] = self.products[product_id]
+        return found
+
+    def put_many(self, products: List[dict]) -> None:
+        with self.lock:
+            for product in products:
+                self.products[product["id"]] = product
+                self.products.move_to_end(product["id"])
+            while len(self.products) > self.max_size:
+                self.products.popitem(last=False)
+
+
+class DiskProductCache:
+    """Products kept in a SQLite file, shared between runs."""
+
+    # SQLite limits the number of bound parameters per statement.
+    lookup_chunk_size = 500
+
+    def __init__(self, path: str) -> None:
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS products (id INTEGER PRIMARY KEY, data TEXT)"
+        )
+        self.connection.commit()
+        self.lock = threading.Lock()
+
+    def get_many(self, product_ids: Iterable[int]) -> Dict[int, dict]:
+        product_ids = list(product_ids)
+        found = {}
+        with self.lock:
+            for start in range(0, len(product_ids), self.lookup_chunk_size):
+                chunk = product_ids[start : start + self.lookup_chunk_size]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.connection.execute(
+                    f"SELECT id, data FROM products WHERE id IN ({placeholders})",
+                    chunk,
+                )
+                found.update((row_id, json.loads(data)) for row_id, data in rows)
+        return found
+
+    def put_many(self, products: List[dict]) -> None:
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO products (id, data) VALUES (?, ?)",
+                ((product["id"], json.dumps(product)) for product in products),
+            )
+            self.connection.commit()
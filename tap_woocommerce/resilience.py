@@ -0,0 +1,78 @@
+"""Failure and latency tracking for WooCommerce endpoints."""
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional
+
+
+class CircuitBreaker:
+    """Stops requests to an endpoint after sustained failures.
+
+    After `threshold` consecutive failed attempts the breaker opens and
+    requests are refused. Once `reset_timeout` seconds have passed a single
+    probe is let through (half-open): success closes the breaker, failure
+    opens it again.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float) -> None:
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Return whether a request may be sent now."""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+
+class LatencyTracker:
+    """Keeps recent request latencies and derives a timeout from them."""
+
+    def __init__(
+        self,
+        percentile: float = 0.99,
+        multiplier: float = 4.0,
+        min_timeout: float = 30.0,
+        max_timeout: float = 500.0,
+        min_samples: int = 20,
+        window: int = 200,
+    ) -> None:
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def timeout(self) -> float:
+        """Return `multiplier` times the latency percentile, within bounds."""
+        if len(self.samples) < self.min_samples:
+            return self.max_timeout
+        ordered = sorted(self.samples)
+        latency = ordered[min(int(len(ordered) * self.percentile), len(ordered) - 1)]
+        return min(max(latency * self.multiplier, self.min_timeout), self.max_timeout)
@@ -0,0 +1,73 @@
+"""Ordering of stream trees by priority, and yielding before a run deadline."""
+
+import time
+from typing import Dict, List, Optional
+
+from singer_sdk import Stream
+
+
+class DeadlineReached(Exception):
+    """A stream stopped at a page boundary to let the run finish in time."""
+
+
+class StreamScheduler:
+    """Decides the order of the stream trees and when each one must yield.
+
+    Trees run in order of the highest `priority` among their streams. With a
+    `deadline` in seconds, every tree yields once it is reached; a tree with
+    a `share` yields after using that fraction of the deadline, and trees
+    below the top priority yield `reserve` seconds early, leaving the end of
+    the run to the most important streams.
+    """
+
+    def __init__(
+        self,
+        priorities: Dict[str, int],
+        shares: Dict[str, float],
+        deadline: Optional[float] = None,
+        reserve: float = 0,
+    ) -> None:
+        self.priorities = priorities
+        self.shares = shares
+        self.deadline = deadline
+        self.reserve = reserve
+        self.started = time.monotonic()
+        self.tree_started: Dict[str, float] = {}
+        self.tree_priorities: Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, config: dict) -> "StreamScheduler":
+        return cls(
+            config.get("stream_priorities", {}),
+            config.get("stream_shares", {}),
+            config.get("run_deadline"),
+            config.get("deadline_reserve", 0),
+        )
+
+    def order(self, streams: List[Stream]) -> List[Stream]:
+        """Return the top-level streams by descending priority of their trees."""
+        for stream in streams:
+            tree = [stream.name] + [s.name for s in stream.descendent_streams]
+            self.tree_priorities[stream.name] = max(
+                self.priorities.get(name, 0) for name in tree
+            )
+        return sorted(streams, key=lambda stream: -self.tree_priorities[stream.name])
+
+    def start(self, stream_name: str) -> None:
+        self.tree_started[stream_name] = time.monotonic()
+
+    def should_yield(self, stream_name: str) -> bool:
+        """Return whether the tree of a top-level stream must stop now."""
+        if self.deadline is None:
+            return False
+        now = time.monotonic()
+        remaining = self.deadline - (now - self.started)
+        if remaining <= 0:
+            return True
+        top_priority = max(self.tree_priorities.values(), default=0)
+        if self.tree_priorities.get(stream_name, 0) < top_priority:
+            if remaining <= self.reserve:
+                return True
+        share = self.shares.get(stream_name)
+        started = self.tree_started.get(stream_name, now)
+        return share is not None and now - started >= share * self.deadline
@@ -0,0 +1,42 @@
+"""Local snapshot cache for slowly changing reference data."""
+
+import json
+import os
+import time
+from typing import Optional
+
+
+class SnapshotCache:
+    """Remembers when each reference stream was fetched and what it contained.
+
+    Only the fetch time and a content hash are stored per stream: a fresh
+    snapshot means the stream is skipped without any request, a stale one with
+    an unchanged hash means the records are not emitted again.
+    """
+
+    def __init__(self, path: str, ttl: int) -> None:
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(path, exist_ok=True)
+
+    def _snapshot_file(self, stream_name: str) -> str:
+        return os.path.join(self.path, f"{stream_name}.json")
+
+    def load(self, stream_name: str) -> Optional[dict]:
+        """Return the snapshot for a stream, if there is one."""
+        try:
+            with open(self._snapshot_file(stream_name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, snapshot: Optional[dict]) -> bool:
+        """Return whether a snapshot was fetched less than `ttl` seconds ago."""
+        return bool(snapshot) and time.time() - snapshot["fetched_at"] < self.ttl
+
+    def save(self, stream_name: str, digest: str) -> None:
+        """Record a fetch of the stream with the given content hash."""
+        snapshot_file = self._snapshot_file(stream_name)
+        with open(f"{snapshot_file}.tmp", "w") as f:
+            json.dump({"fetched_at": time.time(), "hash": digest}, f)
+        os.replace(f"{snapshot_file}.tmp", snapshot_file)
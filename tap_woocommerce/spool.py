@@ -0,0 +1,120 @@
+"""On-disk spool of fetched pages, reused by re-runs after a failed sync."""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import requests
+
+from tap_woocommerce.cassette import build_response, request_key
+
+
+class PageSpool:
+    """Successful GET responses kept in SQLite, keyed by run and request URL.
+
+    The run identifies the state a sync started from, so only a re-run from
+    the same state reuses the pages. Nothing is spooled before a run starts,
+    pages spooled for other runs are discarded when one starts, and the pages
+    of a run once it synced successfully. Pages older than `ttl` seconds are
+    ignored and evicted, and the oldest pages are evicted once the spool holds
+    more than `max_bytes` of bodies.
+    """
+
+    def __init__(self, path: str, ttl: float, max_bytes: int) -> None:
+        self.run: Optional[str] = None
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "run TEXT NOT NULL, request TEXT NOT NULL, created REAL NOT NULL, "
+            "size INTEGER NOT NULL, status INTEGER NOT NULL, reason TEXT, "
+            "headers TEXT NOT NULL, elapsed REAL NOT NULL, body BLOB NOT NULL, "
+            "PRIMARY KEY (run, request))"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS pages_created ON pages (created)"
+        )
+        self.connection.commit()
+
+    def start_run(self, run: str) -> None:
+        """Reuse and spool the pages of a run, discarding those of other runs."""
+        with self.lock:
+            self.run = run
+            self.connection.execute(
+                "DELETE FROM pages WHERE run != ? OR created < ?",
+                [run, time.time() - self.ttl],
+            )
+            self.connection.commit()
+
+    def get(self, request: requests.PreparedRequest) -> Optional[requests.Response]:
+        """Return the spooled response to a request, if it is fresh."""
+        if self.run is None:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT status, reason, headers, body, elapsed FROM pages "
+                "WHERE run = ? AND request = ? AND created >= ?",
+                [
+                    self.run,
+                    request_key(request.method, request.url),
+                    time.time() - self.ttl,
+                ],
+            ).fetchone()
+        if row is None:
+            return None
+        status, reason, headers, body, elapsed = row
+        return build_response(
+            request, status, reason, json.loads(headers), body, elapsed
+        )
+
+    def put(
+        self, request: requests.PreparedRequest, response: requests.Response
+    ) -> None:
+        """Spool a response, evicting the oldest pages beyond the size limit."""
+        if self.run is None:
+            return
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    self.run,
+                    request_key(request.method, request.url),
+                    time.time(),
+                    len(response.content),
+                    response.status_code,
+                    response.reason,
+                    json.dumps(dict(response.headers)),
+                    response.elapsed.total_seconds(),
+                    response.content,
+                ],
+            )
+            (total,) = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM pages"
+            ).fetchone()
+            if total > self.max_bytes:
+                self.evict(total - self.max_bytes)
+            self.connection.commit()
+
+    def evict(self, excess: int) -> None:
+        rows = self.connection.execute(
+            "SELECT run, request, size FROM pages ORDER BY created"
+        )
+        evicted = []
+        for run, request, size in rows:
+            if excess <= 0:
+                break
+            evicted.append((run, request))
+            excess -= size
+        self.connection.executemany(
+            "DELETE FROM pages WHERE run = ? AND request = ?", evicted
+        )
+
+    def clear(self) -> None:
+        """Discard the pages of this run, once it synced successfully."""
+        with self.lock:
+            self.connection.execute("DELETE FROM pages WHERE run = ?", [self.run])
+            self.connection.commit()
@@ -2,9 +2,26 @@
 
 import requests
 from singer_sdk import typing as th  # JSON Schema typing helpers
-from typing import Any, Dict, Optional, Union, List, Iterable
+from singer_sdk.exceptions import FatalAPIError, RetriableAPIError
+from typing import Any, Callable, Dict, Optional, Union, List, Iterable
 
-from tap_woocommerce.client import WooCommerceStream
+from tap_woocommerce.client import ReferenceDataStream, WooCommerceStream
+from tap_woocommerce.product_cache import missing_summary, product_summary
+
+
+def extract_attribution_metadata(row: dict, context: Optional[dict]) -> None:
+    """Get the order attribution metadata from the meta_data field."""
+    if row.get("meta_data"):
+        row["attribution_metadata"] = {
+            meta_data["key"]: meta_data["value"]
+            for meta_data in row["meta_data"]
+            if "_wc_order_attribution_" in meta_data["key"]
+        }
+
+
+def set_order_id(row: dict, context: Optional[dict]) -> None:
+    """Set the parent order id from the stream context."""
+    row["order_id"] = context.get("order_id") if context else None
 
 
 class ProductsStream(WooCommerceStream):
@@ -16,6 +33,7 @@ class ProductsStream(WooCommerceStream):
     replication_key = "date_modified"
     schema = th.PropertiesList(
         th.Property("id", th.IntegerType),
+        th.Property("_sdc_deleted_at", th.DateTimeType),
         th.Property("name", th.StringType),
         th.Property("slug", th.StringType),
         th.Property("permalink", th.StringType),
@@ -152,6 +170,19 @@ class ProductsStream(WooCommerceStream):
         ),
     ).to_dict()
 
+    def transform_page(
+        self, records: List[dict], context: Optional[dict]
+    ) -> List[dict]:
+        records = super().transform_page(records, context)
+        if self._tap.product_cache is not None:
+            self._tap.product_cache.put_many([product_summary(r) for r in records])
+        return records
+
+    def estimate_child_requests(self, child_stream, estimate: dict) -> int:
+        """Only variable products have variations."""
+        resp = self.request_window(None, {"per_page": 1, "type": "variable"})
+        return int(resp.headers.get("X-WP-Total", estimate["records"]))
+
     def get_child_context(self, record: dict, context: Optional[dict]) -> dict:
         """Return a context dictionary for child streams."""
         if record.get("type") == "variable":
@@ -170,6 +201,7 @@ class OrdersStream(WooCommerceStream):
 
     schema = th.PropertiesList(
         th.Property("id", th.IntegerType),
+        th.Property("_sdc_deleted_at", th.DateTimeType),
         th.Property("parent_id", th.NumberType),
         th.Property("number", th.StringType),
         th.Property("order_key", th.StringType),
@@ -368,28 +400,139 @@ class OrdersStream(WooCommerceStream):
         )
     ).to_dict()
 
+    current_order: Optional[dict] = None
+    line_products: Dict[int, dict] = {}
+
     def get_child_context(self, record: dict, context: Optional[dict]) -> dict:
         """Return a context dictionary for child streams."""
-
+        # Kept for the order line streams, which are derived from the payload.
+        self.current_order = record
         return {
             "order_id": record["id"],
         }
 
-    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
-        processed_row = super().post_process(row, context)
+    def estimate_child_requests(self, child_stream, estimate: dict) -> int:
+        """The order line streams are read from the orders, without requests."""
+        if isinstance(child_stream, OrderLinesStream):
+            return 0
+        return super().estimate_child_requests(child_stream, estimate)
+
+    def get_record_fixups(self) -> List[Callable]:
+        return super().get_record_fixups() + [extract_attribution_metadata]
+
+    def transform_page(
+        self, records: List[dict], context: Optional[dict]
+    ) -> List[dict]:
+        records = super().transform_page(records, context)
+        if self._tap.product_cache is not None and any(
+            child_stream.name == OrderLineItemsStream.name and child_stream.selected
+            for child_stream in self.child_streams
+        ):
+            self.line_products = self.lookup_line_products(records)
+        return records
 
-        if processed_row is None:
+    def lookup_line_products(self, orders: List[dict]) -> Dict[int, dict]:
+        """Return the cached products of a page of orders' line items.
+
+        Products missing from the cache are fetched with `products?include=`,
+        one request per 100 missing products, and missing variations with
+        `products/<id>/variations?include=`, one request per parent product.
+        """
+        product_ids = set()
+        for order in orders:
+            for line in order.get("line_items") or []:
+                product_ids.update(
+                    line[key] for key in ["product_id", "variation_id"] if line.get(key)
+                )
+        cache = self._tap.product_cache
+        products = cache.get_many(product_ids)
+        misses = sorted(
+            {
+                line["product_id"]
+                for order in orders
+                for line in order.get("line_items") or []
+                if line.get("product_id") and line["product_id"] not in products
+            }
+        )
+        for start in range(0, len(misses), 100):
+            chunk = misses[start : start + 100]
+            found = self.fetch_products(chunk)
+            if found is None:
+                # Left uncached, so they are requested again with the next page.
+                continue
+            fetched = {p["id"]: product_summary(p) for p in found}
+            # Deleted products are cached empty so they are not requested again.
+            for product_id in chunk:
+                fetched.setdefault(product_id, missing_summary(product_id))
+            cache.put_many(list(fetched.values()))
+            products.update(fetched)
+        products.update(self.lookup_line_variations(orders, products))
+        return products
+
+    def lookup_line_variations(
+        self, orders: List[dict], products: Dict[int, dict]
+    ) -> Dict[int, dict]:
+        """Fetch and cache the variations of order lines missing from `products`."""
+        misses: Dict[int, set] = {}
+        for order in orders:
+            for line in order.get("line_items") or []:
+                variation_id = line.get("variation_id")
+                if variation_id and variation_id not in products:
+                    misses.setdefault(line["product_id"], set()).add(variation_id)
+        variations = {}
+        for product_id, variation_ids in sorted(misses.items()):
+            path = ProductVarianceStream.path.format(product_id=product_id)
+            variation_ids = sorted(variation_ids)
+            for start in range(0, len(variation_ids), 100):
+                chunk = variation_ids[start : start + 100]
+                found = self.fetch_products(chunk, path)
+                if found is None:
+                    continue
+                fetched = {
+                    v["id"]: {**product_summary(v), "parent_id": product_id}
+                    for v in found
+                }
+                for variation_id in chunk:
+                    fetched.setdefault(variation_id, missing_summary(variation_id))
+                self._tap.product_cache.put_many(list(fetched.values()))
+                variations.update(fetched)
+        return variations
+
+    def fetch_products(
+        self, product_ids: List[int], path: str = ProductsStream.path
+    ) -> Optional[List[dict]]:
+        """Request products (or the variations of a product at `path`) by ID.
+
+        The enrichment is optional: the request is not retried, and None is
+        returned if it fails, so the order sync carries on without it.
+        """
+        prepared_request = requests.Request(
+            "GET",
+            f"{self.url_base}{path}",
+            params={
+                "include": ",".join(str(product_id) for product_id in product_ids),
+                "per_page": len(product_ids),
+            },
+            headers=self.http_headers,
+            auth=(self.config["consumer_key"], self.config["consumer_secret"]),
+        ).prepare()
+        try:
+            response = self._request(prepared_request, None)
+            products = response.json()
+        except (
+            FatalAPIError,
+            RetriableAPIError,
+            requests.exceptions.RequestException,
+            ValueError,
+        ) as e:
+            self.logger.warning(f"Could not look up products at {path}: {e}")
             return None
-        
-        if processed_row.get("meta_data"):
-            # Get the order attribution metadata from the meta_data field
-            attribution_metadata = {}
-            for meta_data in processed_row["meta_data"]:
-                if "_wc_order_attribution_" in meta_data["key"]:
-                    attribution_metadata[meta_data["key"]] = meta_data["value"]
-            processed_row["attribution_metadata"] = attribution_metadata
-        
-        return processed_row
+        if response.status_code >= 400 or not isinstance(products, list):
+            self.logger.warning(
+                f"Could not look up products at {path}: {response.status_code}"
+            )
+            return None
+        return products
 
 
 class CouponsStream(WooCommerceStream):
@@ -400,6 +543,7 @@ class CouponsStream(WooCommerceStream):
 
     schema = th.PropertiesList(
         th.Property("id", th.IntegerType),
+        th.Property("_sdc_deleted_at", th.DateTimeType),
         th.Property("code", th.StringType),
         th.Property("amount", th.StringType),
         th.Property("date_created", th.DateTimeType),
@@ -433,6 +577,8 @@ class ProductVarianceStream(WooCommerceStream):
     path = "products/{product_id}/variations"
     primary_keys = ["id"]
     parent_stream_type = ProductsStream
+    # Without a replication key, per-product partitions would only bloat the state.
+    state_partitioning_keys: List[str] = []
 
     schema = th.PropertiesList(
         th.Property("id", th.IntegerType),
@@ -526,14 +672,20 @@ class ProductVarianceStream(WooCommerceStream):
         ),
     ).to_dict()
 
+    def transform_page(
+        self, records: List[dict], context: Optional[dict]
+    ) -> List[dict]:
+        records = super().transform_page(records, context)
+        if self._tap.product_cache is not None:
+            summaries = [product_summary(r) for r in records]
+            for summary in summaries:
+                summary["parent_id"] = context.get("product_id") if context else None
+            self._tap.product_cache.put_many(summaries)
+        return records
+
     def check_endpoint_exists(self) -> bool:
         # Check that the parent stream endpoint exists
-        full_path = f"{self.url_base}{ProductsStream.path}"
-        response = requests.get(
-            url=full_path,
-            auth=(self.config["consumer_key"], self.config["consumer_secret"]),
-        )
-        return response.status_code != 404
+        return self.get_endpoint_status(ProductsStream.path) != 404
 
 
 class SubscriptionStream(WooCommerceStream):
@@ -799,6 +951,7 @@ class CustomersStream(WooCommerceStream):
     replication_key = "date_modified"
     schema = th.PropertiesList(
         th.Property("id", th.IntegerType),
+        th.Property("_sdc_deleted_at", th.DateTimeType),
         th.Property("date_created", th.DateTimeType),
         th.Property("date_modified", th.DateTimeType),
         th.Property("date_created_gmt", th.DateTimeType),
@@ -864,13 +1017,12 @@ class CustomersStream(WooCommerceStream):
     ).to_dict()
 
 
-class StoreSettingsStream(WooCommerceStream):
+class StoreSettingsStream(ReferenceDataStream):
     """Define settings stream."""
 
     name = "store_settings"
     path = "settings/general"
     primary_keys = ["id"]
-    replication_key = None
     schema = th.PropertiesList(
         th.Property("id", th.StringType),
         th.Property("label", th.StringType),
@@ -891,6 +1043,8 @@ class OrderNotesStream(WooCommerceStream):
     primary_keys = ["id"]
     parent_stream_type = OrdersStream
     replication_key = None
+    # Without a replication key, per-order partitions would only bloat the state.
+    state_partitioning_keys: List[str] = []
     schema = th.PropertiesList(
         th.Property("id", th.NumberType),
         th.Property("order_id", th.NumberType),
@@ -904,13 +1058,304 @@ class OrderNotesStream(WooCommerceStream):
 
     def check_endpoint_exists(self) -> bool:
         # Check that the parent stream endpoint exists
-        full_path = f"{self.url_base}{OrdersStream.path}"
-        response = requests.get(
-            url=full_path,
-            auth=(self.config["consumer_key"], self.config["consumer_secret"]),
+        return self.get_endpoint_status(OrdersStream.path) != 404
+
+    def get_record_fixups(self) -> List[Callable]:
+        return super().get_record_fixups() + [set_order_id]
+
+
+META_DATA_PROPERTY = th.Property(
+    "meta_data",
+    th.ArrayType(
+        th.ObjectType(
+            th.Property("id", th.IntegerType),
+            th.Property("key", th.StringType),
+            th.Property(
+                "value",
+                th.CustomType(
+                    {"type": ["object", "array", "string", "number", "boolean"]}
+                ),
+            ),
+        )
+    ),
+)
+
+LINE_TAXES_PROPERTY = th.Property(
+    "taxes",
+    th.ArrayType(
+        th.ObjectType(
+            th.Property("id", th.CustomType({"type": ["integer", "string"]})),
+            th.Property("total", th.StringType),
+            th.Property("subtotal", th.StringType),
         )
-        return response.status_code != 404
+    ),
+)
+
+
+class OrderLinesStream(WooCommerceStream):
+    """Base class for streams derived from the lines of the current order.
+
+    The lines are read from the order payload that `OrdersStream` already
+    fetched, so these streams never make requests while syncing.
+    """
+
+    parent_stream_type = OrdersStream
+    primary_keys = ["id"]
+    replication_key = None
+    state_partitioning_keys: List[str] = []
+    lines_key: str
+
+    def check_endpoint_exists(self) -> bool:
+        # Available whenever the orders stream is, which is checked on its own.
+        return True
 
-    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
-        row["order_id"] = context.get("order_id") if context else None
-        return row
+    def get_records(self, context: Optional[dict]) -> Iterable[dict]:
+        lines = list(self.get_lines())
+        if self.emitted_index is not None:
+            # Lines of an unchanged order are unchanged too.
+            self.index_page(lines)
+        yield from lines
+
+    def get_lines(self) -> Iterable[dict]:
+        """Return the lines of the current order."""
+        order = self._tap.streams[OrdersStream.name].current_order
+        if not order:
+            return
+        order_date_modified = order.get(OrdersStream.replication_key)
+        for line in order.get(self.lines_key) or []:
+            yield {
+                **line,
+                "order_id": order["id"],
+                "order_date_modified": order_date_modified,
+            }
+
+
+class OrderLineItemsStream(OrderLinesStream):
+    """Define order line items stream."""
+
+    name = "order_line_items"
+    lines_key = "line_items"
+    schema = th.PropertiesList(
+        th.Property("id", th.IntegerType),
+        th.Property("order_id", th.IntegerType),
+        th.Property("order_date_modified", th.DateTimeType),
+        th.Property("name", th.StringType),
+        th.Property("product_id", th.IntegerType),
+        th.Property("variation_id", th.IntegerType),
+        th.Property("quantity", th.NumberType),
+        th.Property("tax_class", th.StringType),
+        th.Property("subtotal", th.StringType),
+        th.Property("subtotal_tax", th.StringType),
+        th.Property("total", th.StringType),
+        th.Property("total_tax", th.StringType),
+        LINE_TAXES_PROPERTY,
+        META_DATA_PROPERTY,
+        th.Property("sku", th.CustomType({"type": ["boolean", "string"]})),
+        th.Property("price", th.NumberType),
+        th.Property("parent_name", th.StringType),
+        th.Property("product_sku", th.StringType),
+        th.Property("product_type", th.StringType),
+        th.Property("product_parent_id", th.IntegerType),
+        th.Property(
+            "product_categories",
+            th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.IntegerType),
+                    th.Property("name", th.StringType),
+                )
+            ),
+        ),
+    ).to_dict()
+
+    def get_lines(self) -> Iterable[dict]:
+        products = self._tap.streams[OrdersStream.name].line_products
+        for line in super().get_lines():
+            if products:
+                line.update(self.get_product_fields(line, products))
+            yield line
+
+    def get_product_fields(self, line: dict, products: Dict[int, dict]) -> dict:
+        """Return the fields of the line's product (or variation) and its parent."""
+        parent = products.get(line.get("product_id")) or {}
+        product = parent
+        if line.get("variation_id"):
+            product = products.get(line["variation_id"]) or {}
+        return {
+            "product_sku": product.get("sku"),
+            "product_type": product.get("type"),
+            "product_parent_id": product.get("parent_id"),
+            "product_categories": parent.get("categories"),
+        }
+
+
+class OrderShippingLinesStream(OrderLinesStream):
+    """Define order shipping lines stream."""
+
+    name = "order_shipping_lines"
+    lines_key = "shipping_lines"
+    schema = th.PropertiesList(
+        th.Property("id", th.IntegerType),
+        th.Property("order_id", th.IntegerType),
+        th.Property("order_date_modified", th.DateTimeType),
+        th.Property("method_title", th.StringType),
+        th.Property("method_id", th.StringType),
+        th.Property("instance_id", th.StringType),
+        th.Property("total", th.StringType),
+        th.Property("total_tax", th.StringType),
+        LINE_TAXES_PROPERTY,
+        META_DATA_PROPERTY,
+    ).to_dict()
+
+
+class OrderFeeLinesStream(OrderLinesStream):
+    """Define order fee lines stream."""
+
+    name = "order_fee_lines"
+    lines_key = "fee_lines"
+    schema = th.PropertiesList(
+        th.Property("id", th.IntegerType),
+        th.Property("order_id", th.IntegerType),
+        th.Property("order_date_modified", th.DateTimeType),
+        th.Property("name", th.StringType),
+        th.Property("tax_class", th.StringType),
+        th.Property("tax_status", th.StringType),
+        th.Property("amount", th.StringType),
+        th.Property("total", th.StringType),
+        th.Property("total_tax", th.StringType),
+        LINE_TAXES_PROPERTY,
+        META_DATA_PROPERTY,
+    ).to_dict()
+
+
+class OrderCouponLinesStream(OrderLinesStream):
+    """Define order coupon lines stream."""
+
+    name = "order_coupon_lines"
+    lines_key = "coupon_lines"
+    schema = th.PropertiesList(
+        th.Property("id", th.IntegerType),
+        th.Property("order_id", th.IntegerType),
+        th.Property("order_date_modified", th.DateTimeType),
+        th.Property("code", th.StringType),
+        th.Property("discount", th.CustomType({"type": ["string", "number"]})),
+        th.Property("discount_tax", th.StringType),
+        META_DATA_PROPERTY,
+    ).to_dict()
+
+
+class ProductCategoriesStream(ReferenceDataStream):
+    """Define product categories stream."""
+
+    name = "product_categories"
+    path = "products/categories"
+    primary_keys = ["id"]
+    schema = th.PropertiesList(
+        th.Property("id", th.IntegerType),
+        th.Property("name", th.StringType),
+        th.Property("slug", th.StringType),
+        th.Property("parent", th.IntegerType),
+        th.Property("description", th.StringType),
+        th.Property("display", th.StringType),
+        th.Property(
+            "image",
+            th.ObjectType(
+                th.Property("id", th.IntegerType),
+                th.Property("date_created", th.DateTimeType),
+                th.Property("date_created_gmt", th.DateTimeType),
+                th.Property("date_modified", th.DateTimeType),
+                th.Property("date_modified_gmt", th.DateTimeType),
+                th.Property("src", th.StringType),
+                th.Property("name", th.StringType),
+                th.Property("alt", th.StringType),
+            ),
+        ),
+        th.Property("menu_order", th.IntegerType),
+        th.Property("count", th.IntegerType),
+    ).to_dict()
+
+
+class ProductTagsStream(ReferenceDataStream):
+    """Define product tags stream."""
+
+    name = "product_tags"
+    path = "products/tags"
+    primary_keys = ["id"]
+    schema = th.PropertiesList(
+        th.Property("id", th.IntegerType),
+        th.Property("name", th.StringType),
+        th.Property("slug", th.StringType),
+        th.Property("description", th.StringType),
+        th.Property("count", th.IntegerType),
+    ).to_dict()
+
+
+class ProductAttributesStream(ReferenceDataStream):
+    """Define product attributes stream."""
+
+    name = "product_attributes"
+    path = "products/attributes"
+    primary_keys = ["id"]
+    schema = th.PropertiesList(
+        th.Property("id", th.IntegerType),
+        th.Property("name", th.StringType),
+        th.Property("slug", th.StringType),
+        th.Property("type", th.StringType),
+        th.Property("order_by", th.StringType),
+        th.Property("has_archives", th.BooleanType),
+    ).to_dict()
+
+
+class TaxRatesStream(ReferenceDataStream):
+    """Define tax rates stream."""
+
+    name = "tax_rates"
+    path = "taxes"
+    primary_keys = ["id"]
+    schema = th.PropertiesList(
+        th.Property("id", th.IntegerType),
+        th.Property("country", th.StringType),
+        th.Property("state", th.StringType),
+        th.Property("postcode", th.StringType),
+        th.Property("city", th.StringType),
+        th.Property("postcodes", th.ArrayType(th.StringType)),
+        th.Property("cities", th.ArrayType(th.StringType)),
+        th.Property("rate", th.StringType),
+        th.Property("name", th.StringType),
+        th.Property("priority", th.IntegerType),
+        th.Property("compound", th.BooleanType),
+        th.Property("shipping", th.BooleanType),
+        th.Property("order", th.IntegerType),
+        th.Property("class", th.StringType),
+    ).to_dict()
+
+
+class ShippingZonesStream(ReferenceDataStream):
+    """Define shipping zones stream."""
+
+    name = "shipping_zones"
+    path = "shipping/zones"
+    primary_keys = ["id"]
+    schema = th.PropertiesList(
+        th.Property("id", th.IntegerType),
+        th.Property("name", th.StringType),
+        th.Property("order", th.IntegerType),
+    ).to_dict()
+
+
+class PaymentGatewaysStream(ReferenceDataStream):
+    """Define payment gateways stream."""
+
+    name = "payment_gateways"
+    path = "payment_gateways"
+    primary_keys = ["id"]
+    schema = th.PropertiesList(
+        th.Property("id", th.StringType),
+        th.Property("title", th.StringType),
+        th.Property("description", th.StringType),
+        th.Property("order", th.CustomType({"type": ["integer", "string"]})),
+        th.Property("enabled", th.BooleanType),
+        th.Property("method_title", th.StringType),
+        th.Property("method_description", th.StringType),
+        th.Property("method_supports", th.ArrayType(th.StringType)),
+        th.Property("settings", th.CustomType({"type": ["object", "array"]})),
+    ).to_dict()
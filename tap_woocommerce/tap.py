@@ -1,8 +1,18 @@
 """WooCommerce tap class."""
 
-from typing import List
+import copy
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 
+from singer import StateMessage
 from singer_sdk import Stream, Tap
+from singer_sdk.exceptions import FatalAPIError
+from singer_sdk.helpers._util import utc_now
 from singer_sdk import typing as th  # JSON schema typing helpers
 
 from tap_woocommerce.streams import (
@@ -15,7 +25,28 @@ from tap_woocommerce.streams import (
     CustomersStream,
     StoreSettingsStream,
     OrderNotesStream,
+    OrderLineItemsStream,
+    OrderShippingLinesStream,
+    OrderFeeLinesStream,
+    OrderCouponLinesStream,
+    ProductCategoriesStream,
+    ProductTagsStream,
+    ProductAttributesStream,
+    TaxRatesStream,
+    ShippingZonesStream,
+    PaymentGatewaysStream,
 )
+from tap_woocommerce.batch import BatchWriter
+from tap_woocommerce.client import StreamUnavailableError
+from tap_woocommerce.budget import MemoryBudget
+from tap_woocommerce.cassette import Cassette
+from tap_woocommerce.emitted_index import EmittedIndex, content_hash
+from tap_woocommerce.origins import OriginPool
+from tap_woocommerce.scheduler import DeadlineReached, StreamScheduler
+from tap_woocommerce.spool import PageSpool
+from tap_woocommerce.product_cache import DiskProductCache, MemoryProductCache
+from tap_woocommerce.webhook import TOPIC_STREAMS, WebhookListener
+from tap_woocommerce.writer import MessageWriter
 
 STREAM_TYPES = [
     ProductsStream,
@@ -26,8 +57,31 @@ STREAM_TYPES = [
     CustomersStream,
     StoreSettingsStream,
     OrderNotesStream,
+    OrderLineItemsStream,
+    OrderShippingLinesStream,
+    OrderFeeLinesStream,
+    OrderCouponLinesStream,
+    ProductCategoriesStream,
+    ProductTagsStream,
+    ProductAttributesStream,
+    TaxRatesStream,
+    ShippingZonesStream,
+    PaymentGatewaysStream,
 ]
 
+# Settings naming files or directories a tap keeps between runs. With several
+# stores, every store gets its own under a directory named after its id.
+STORE_FILE_SETTINGS = [
+    "reconcile_path",
+    "emitted_index_path",
+    "product_cache",
+    "page_spool_path",
+    "http_cassette",
+]
+STORE_DIR_SETTINGS = ["reference_cache_path", "batch_output_dir"]
+# Settings of how the top-level tap runs, never passed on to the store taps.
+RUN_MODE_SETTINGS = ["plan_only", "poll_interval", "poll_jitter", "webhook_port"]
+
 import logging
 
 
@@ -37,19 +91,159 @@ class TapWooCommerce(Tap):
     name = "tap-woocommerce"
 
     config_jsonschema = th.PropertiesList(
-        th.Property("consumer_key", th.StringType, required=True),
-        th.Property("consumer_secret", th.StringType, required=True),
-        th.Property("site_url", th.StringType, required=True),
+        th.Property("consumer_key", th.StringType),
+        th.Property("consumer_secret", th.StringType),
+        th.Property("site_url", th.StringType),
         th.Property("start_date", th.DateTimeType, default="2000-01-01T00:00:00.000Z"),
+        th.Property(
+            "stores",
+            th.ArrayType(
+                th.ObjectType(
+                    th.Property("store_id", th.StringType),
+                    th.Property("consumer_key", th.StringType, required=True),
+                    th.Property("consumer_secret", th.StringType, required=True),
+                    th.Property("site_url", th.StringType, required=True),
+                )
+            ),
+        ),
     ).to_dict()
+    # Either a single store or a list of stores must be configured.
+    config_jsonschema["anyOf"] = [
+        {"required": ["consumer_key", "consumer_secret", "site_url"]},
+        {"required": ["stores"]},
+    ]
+
+    _message_writer: Optional[MessageWriter] = None
+    _batch_writer: Optional[BatchWriter] = None
+    _memory_budget: Optional[MemoryBudget] = None
+    _product_cache = None
+    _http_cassette: Optional[Cassette] = None
+    _page_spool: Optional[PageSpool] = None
+    _emitted_index: Optional[EmittedIndex] = None
+    _scheduler: Optional[StreamScheduler] = None
+    _origin_pool: Optional[OriginPool] = None
+    _store_states: dict = {}
+    _published_state: Optional[dict] = None
+    _stream_trees: Dict[str, List[str]] = {}
+    _failed_streams: List[str] = []
+    _state_written_at = 0.0
+
+    @property
+    def message_writer(self) -> MessageWriter:
+        """Return the writer all streams of this tap emit their messages through."""
+        if self._message_writer is None:
+            self._message_writer = MessageWriter.from_config(self.config)
+        return self._message_writer
+
+    @message_writer.setter
+    def message_writer(self, writer: MessageWriter) -> None:
+        self._message_writer = writer
+
+    @property
+    def batch_writer(self) -> Optional[BatchWriter]:
+        """Return the batch writer, if records are written to batch files."""
+        if self._batch_writer is None:
+            self._batch_writer = BatchWriter.from_config(
+                self.config, self.message_writer
+            )
+        return self._batch_writer
+
+    @property
+    def memory_budget(self) -> MemoryBudget:
+        """Return the budget of bytes of fetched pages waiting to be emitted."""
+        if self._memory_budget is None:
+            self._memory_budget = MemoryBudget(
+                self.config.get("memory_budget_bytes", 256 * 1024 * 1024)
+            )
+        return self._memory_budget
+
+    @property
+    def product_cache(self):
+        """Return the product cache enriching order lines, if `product_cache` is set.
+
+        `product_cache` is either `memory`, for an LRU of `product_cache_size`
+        products, or the path of a SQLite file kept between runs.
+        """
+        product_cache = self.config.get("product_cache")
+        if not product_cache:
+            return None
+        if self._product_cache is None:
+            if product_cache == "memory":
+                self._product_cache = MemoryProductCache(
+                    self.config.get("product_cache_size", 10000)
+                )
+            else:
+                self._product_cache = DiskProductCache(product_cache)
+        return self._product_cache
+
+    @property
+    def http_cassette(self) -> Optional[Cassette]:
+        """Return the cassette recording or replaying HTTP, with `http_cassette`."""
+        if not self.config.get("http_cassette"):
+            return None
+        if self._http_cassette is None:
+            self._http_cassette = Cassette(
+                self.config["http_cassette"],
+                self.config.get("http_cassette_mode", "replay"),
+                self.config.get("http_replay_latency", 0),
+            )
+        return self._http_cassette
+
+    @property
+    def page_spool(self) -> Optional[PageSpool]:
+        """Return the spool of fetched pages, if `page_spool_path` is set."""
+        if not self.config.get("page_spool_path"):
+            return None
+        if self._page_spool is None:
+            self._page_spool = PageSpool(
+                self.config["page_spool_path"],
+                self.config.get("page_spool_ttl", 3600),
+                self.config.get("page_spool_max_bytes", 1024 * 1024 * 1024),
+            )
+        return self._page_spool
+
+    @property
+    def emitted_index(self) -> Optional[EmittedIndex]:
+        """Return the index of emitted records, if `emitted_index_path` is set."""
+        if not self.config.get("emitted_index_path"):
+            return None
+        if self._emitted_index is None:
+            self._emitted_index = EmittedIndex(self.config["emitted_index_path"])
+        return self._emitted_index
+
+    @property
+    def origin_pool(self) -> Optional[OriginPool]:
+        """Return the pool of origins requests are spread over, if `origins` is set."""
+        if self._origin_pool is None:
+            self._origin_pool = OriginPool.from_config(self.config)
+        return self._origin_pool
+
+    @property
+    def scheduler(self) -> Optional[StreamScheduler]:
+        """Return the scheduler of the running sync cycle."""
+        return self._scheduler
+
+    def load_state(self, state: dict) -> None:
+        super().load_state(state)
+        self._store_states = state.get("stores", {})
 
     def discover_streams(self) -> List[Stream]:
         """Return a list of discovered streams."""
+        if self.config.get("stores"):
+            # Every store runs its own discovery, the catalog lists all streams.
+            return [stream_class(tap=self) for stream_class in STREAM_TYPES]
         available_streams = []
         for stream_class in STREAM_TYPES:
             # check that endpoint exists
             stream = stream_class(tap=self)
-            if stream.check_endpoint_exists():
+            parent_type = stream_class.parent_stream_type
+            if parent_type and not any(
+                isinstance(parent, parent_type) for parent in available_streams
+            ):
+                logging.info(
+                    f"Parent of {stream_class.name} is not available, skipping."
+                )
+            elif stream.check_endpoint_exists():
                 available_streams.append(stream)
             else:
                 logging.info(
@@ -57,6 +251,408 @@ class TapWooCommerce(Tap):
                 )
         return available_streams
 
+    def sync_all(self) -> None:
+        self._failed_streams = []
+        if self.config.get("plan_only"):
+            if self.config.get("stores"):
+                self.print_store_plans()
+            else:
+                self.print_sync_plan()
+            return
+        if self.config.get("stores") and self.config.get("webhook_port"):
+            raise ValueError("`webhook_port` cannot be used with `stores`.")
+        try:
+            if self.config.get("poll_interval"):
+                self.poll_forever()
+            elif self.config.get("stores"):
+                self.sync_stores()
+            elif self.config.get("webhook_port"):
+                self.listen_webhooks()
+            else:
+                self.sync_cycle()
+        finally:
+            self.message_writer.close()
+            if self._http_cassette is not None:
+                self._http_cassette.close()
+        if self._failed_streams:
+            raise FatalAPIError(
+                f"Streams unavailable: {', '.join(self._failed_streams)}"
+            )
+
+    def write_state_message(self, stream: Stream, force: bool = False) -> None:
+        """Write a STATE message on behalf of a stream.
+
+        In concurrent mode each stream tree only publishes a snapshot of its own
+        bookmarks, the other trees contribute the bookmarks they last published.
+        That way no message reflects a bookmark another thread is still moving.
+        When writing batch files, the message waits until the open batches are
+        complete. With `state_min_interval`, messages less than that many
+        seconds after the previous one are dropped unless `force` is set, as
+        it is for the message ending a stream tree.
+        """
+        min_interval = self.config.get("state_min_interval")
+        if (
+            min_interval
+            and not force
+            and time.monotonic() - self._state_written_at < min_interval
+        ):
+            return
+        if self.batch_writer is not None and self.batch_writer.defer_state(
+            stream.name, lambda: self.write_state_message(stream, force=True)
+        ):
+            return
+        self._state_written_at = time.monotonic()
+        if self._published_state is None:
+            self.message_writer.write_message(StateMessage(value=self.state))
+            return
+        with self._state_lock:
+            bookmarks = self._published_state.setdefault("bookmarks", {})
+            for name in self._stream_trees[stream.name]:
+                if name in self.state.get("bookmarks", {}):
+                    bookmarks[name] = copy.deepcopy(self.state["bookmarks"][name])
+            self.message_writer.write_message(
+                StateMessage(value=self._published_state)
+            )
+
+    def estimate_sync(self) -> List[dict]:
+        """Estimate records, requests and time of every selected stream.
+
+        Child streams are estimated at one request per parent record they are
+        synced for, at the latency measured on their parent.
+        """
+        estimates = []
+        self._reset_state_progress_markers()
+        for stream in self.get_top_level_streams():
+            # Set the starting bookmark the filters of the probe are built from.
+            stream._write_starting_replication_value(None)
+            estimate = stream.estimate_sync()
+            estimate["seconds"] = estimate["requests"] * estimate["latency"]
+            if stream.selected:
+                estimates.append(estimate)
+            for child_stream in stream.child_streams:
+                if not child_stream.selected:
+                    continue
+                requests = stream.estimate_child_requests(child_stream, estimate)
+                estimates.append(
+                    {
+                        "stream": child_stream.name,
+                        "records": None,
+                        "requests": requests,
+                        "latency": estimate["latency"],
+                        "seconds": requests * estimate["latency"],
+                    }
+                )
+        return estimates
+
+    def print_sync_plan(self) -> None:
+        """Print the estimated cost of a sync instead of running it."""
+        estimates = self.estimate_sync()
+        print(f"{'stream':<24}{'records':>12}{'requests':>12}{'est. seconds':>16}")
+        for estimate in estimates:
+            records = "-" if estimate["records"] is None else estimate["records"]
+            print(
+                f"{estimate['stream']:<24}{records:>12}"
+                f"{estimate['requests']:>12}{estimate['seconds']:>16.0f}"
+            )
+        total_requests = sum(estimate["requests"] for estimate in estimates)
+        total_seconds = sum(estimate["seconds"] for estimate in estimates)
+        print(f"{'total':<24}{'':>12}{total_requests:>12}{total_seconds:>16.0f}")
+
+    def print_store_plans(self) -> None:
+        """Print the estimated cost of a sync of every store."""
+        for store_config in self.get_store_configs():
+            print(f"store {store_config['store_id']}")
+            self.make_store_tap(store_config).print_sync_plan()
+
+    def get_top_level_streams(self) -> List[Stream]:
+        """Return the streams to sync directly, their children sync with them.
+
+        While syncing, the streams are ordered by the priority of their trees.
+        """
+        top_level_streams = []
+        for stream in self.streams.values():
+            if not stream.selected and not stream.has_selected_descendents:
+                self.logger.info(f"Skipping deselected stream '{stream.name}'.")
+            elif not stream.parent_stream_type:
+                top_level_streams.append(stream)
+        if self.scheduler is not None:
+            return self.scheduler.order(top_level_streams)
+        return top_level_streams
+
+    def sync_stream_tree(self, stream: Stream) -> None:
+        """Sync a top-level stream together with its children.
+
+        A tree where the endpoint of any stream is unavailable is abandoned
+        without finalizing its bookmarks, so the other trees can still finish.
+        A stream yielding to the run deadline stops after a complete page; as
+        pages are ordered by modification date, its bookmarks are finalized
+        just before the last timestamp it emitted.
+        """
+        if self.scheduler is not None:
+            if self.scheduler.should_yield(stream.name):
+                self.logger.info(f"Not starting '{stream.name}' before the deadline.")
+                return
+            self.scheduler.start(stream.name)
+        try:
+            stream.sync()
+        except DeadlineReached as e:
+            self.logger.info(str(e))
+            stream.hold_back_progress()
+            stream.finalize_state_progress_markers()
+        except StreamUnavailableError as e:
+            self.logger.error(f"Abandoning stream '{stream.name}': {e}")
+            self._failed_streams.append(stream.name)
+        else:
+            stream.finalize_state_progress_markers()
+        self.write_state_message(stream, force=True)
+
+    def sync_streams(self) -> None:
+        """Sync the selected top-level streams one after another."""
+        self._reset_state_progress_markers()
+        self._set_compatible_replication_methods()
+        for stream in self.get_top_level_streams():
+            self.sync_stream_tree(stream)
+
+    def sync_streams_concurrently(self) -> None:
+        """Sync the selected top-level streams in parallel threads.
+
+        Each stream and its children run in one thread, so their messages keep
+        their order; the tap's message writer serializes the lines on stdout.
+        """
+        self._reset_state_progress_markers()
+        self._set_compatible_replication_methods()
+        top_level_streams = self.get_top_level_streams()
+        self._stream_trees = {}
+        for stream in top_level_streams:
+            tree = [stream.name] + [s.name for s in stream.descendent_streams]
+            for name in tree:
+                self._stream_trees[name] = tree
+        self._state_lock = threading.Lock()
+        self._published_state = copy.deepcopy(self.state)
+        max_workers = self.config["concurrent_streams"]
+        if max_workers is True:
+            max_workers = len(top_level_streams) or 1
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for future in [
+                pool.submit(self.sync_stream_tree, stream)
+                for stream in top_level_streams
+            ]:
+                future.result()
+        self._published_state = None
+        self.message_writer.write_message(StateMessage(value=self.state))
+
+    def sync_cycle(self) -> None:
+        """Sync the selected streams once and complete the open batches.
+
+        The run deadline and the retry budget of every stream count from the
+        start of the cycle. Spooled pages are only reused by a cycle starting
+        from the same state, and discarded once a cycle succeeds.
+        """
+        self._scheduler = StreamScheduler.from_config(self.config)
+        for stream in self.streams.values():
+            stream.start_cycle()
+        if self.page_spool is not None:
+            self.page_spool.start_run(content_hash(self.state))
+        if self.config.get("concurrent_streams"):
+            self.sync_streams_concurrently()
+        else:
+            self.sync_streams()
+        if self.batch_writer is not None:
+            self.batch_writer.flush()
+        if self._page_spool is not None and not self._failed_streams:
+            self._page_spool.clear()
+
+    def poll_forever(self) -> None:
+        """Run incremental syncs every `poll_interval` seconds until interrupted.
+
+        The streams are only discovered once, and keep their HTTP sessions,
+        detected WooCommerce version and caches between cycles. Cycles start
+        up to `poll_jitter` seconds late so many stores don't poll in step.
+        A failed cycle is logged and retried at the next interval. With
+        `stores`, every cycle syncs all stores, each from its last state.
+        """
+        interval = self.config["poll_interval"]
+        jitter = self.config.get("poll_jitter", interval / 10)
+        stores = self.config.get("stores")
+        try:
+            while True:
+                started = time.monotonic()
+                try:
+                    if stores:
+                        self.sync_stores()
+                    else:
+                        self.sync_cycle()
+                except Exception:
+                    self.logger.exception("Sync cycle failed.")
+                if self._failed_streams:
+                    self.logger.error(
+                        f"Streams unavailable: {', '.join(self._failed_streams)}"
+                    )
+                    self._failed_streams = []
+                if not stores:
+                    # Stores write their states as they finish.
+                    self.message_writer.write_message(StateMessage(value=self.state))
+                elapsed = time.monotonic() - started
+                time.sleep(max(0, interval - elapsed) + random.uniform(0, jitter))
+        except KeyboardInterrupt:
+            self.logger.info("Stopping the polling loop.")
+
+    def listen_webhooks(self) -> None:
+        """Emit webhook deliveries as records until interrupted.
+
+        The selected streams are synced by polling on start and then every
+        `webhook_gap_fill_interval` seconds, which fills in deliveries that
+        were missed and moves the bookmarks forward.
+        """
+        if not self.config.get("webhook_secret"):
+            raise ValueError("`webhook_port` requires a `webhook_secret`.")
+        port = self.config["webhook_port"]
+        listener = WebhookListener(
+            self.config.get("webhook_host", "0.0.0.0"),
+            port,
+            self.config["webhook_secret"],
+        )
+        listener.start()
+        self.logger.info(f"Listening for webhooks on port {port}.")
+        interval = self.config.get("webhook_gap_fill_interval", 3600)
+        next_gap_fill = time.monotonic()
+        try:
+            while True:
+                if time.monotonic() >= next_gap_fill:
+                    self.sync_cycle()
+                    next_gap_fill = time.monotonic() + interval
+                delivery = listener.get(
+                    timeout=max(0, next_gap_fill - time.monotonic())
+                )
+                if delivery is not None:
+                    self.emit_webhook(*delivery)
+                    self.message_writer.flush()
+        except KeyboardInterrupt:
+            self.logger.info("Stopping the webhook listener.")
+        finally:
+            listener.close()
+
+    def emit_webhook(self, topic: str, payload: dict) -> None:
+        """Emit the record of a webhook delivery through its stream.
+
+        The payload goes through the same `meta_data` filter and fix-ups as
+        polled records. Deleted
+        records are emitted as `{"id": ..., "_sdc_deleted_at": ...}`.
+        """
+        resource, _, event = topic.partition(".")
+        stream = self.streams.get(TOPIC_STREAMS.get(resource, ""))
+        if stream is None or not stream.selected:
+            return
+        stream._write_schema_message()
+        stream.forget_page()
+        if event == "deleted":
+            if "_sdc_deleted_at" in stream.schema["properties"]:
+                stream._write_record_message(
+                    {"id": payload["id"], "_sdc_deleted_at": utc_now().isoformat()}
+                )
+            return
+        meta_data_filter = stream.meta_data_filter
+        if meta_data_filter is not None:
+            meta_data_filter(payload)
+        for record in stream.transform_page([payload], None):
+            stream._write_record_message(record)
+            stream._sync_children(stream.get_child_context(record, None))
+
+    def get_store_configs(self) -> List[dict]:
+        """Return the full config of every store, inheriting top-level settings.
+
+        Inherited paths of files and directories kept between runs are moved
+        under a directory named after the store id, so stores never share
+        their ID sets, snapshots, indexes, caches, spools, cassettes or batches.
+        """
+        base_config = {
+            k: v
+            for k, v in self.config.items()
+            if k != "stores" and k not in RUN_MODE_SETTINGS
+        }
+        store_configs = []
+        for store in self.config["stores"]:
+            store_config = {**base_config, **store}
+            store_id = store_config.setdefault(
+                "store_id", urlparse(store["site_url"]).netloc
+            )
+            defaults = {}
+            if store_config.get("reconcile_deletes"):
+                defaults["reconcile_path"] = "reconcile.db"
+            for key in STORE_FILE_SETTINGS:
+                path = base_config.get(key, defaults.get(key))
+                if key in store or not path or path == "memory":
+                    continue
+                head, tail = os.path.split(path)
+                store_config[key] = os.path.join(head, store_id, tail)
+            for key in STORE_DIR_SETTINGS:
+                if key not in store and base_config.get(key):
+                    store_config[key] = os.path.join(base_config[key], store_id)
+            store_configs.append(store_config)
+        return store_configs
+
+    def make_store_tap(self, store_config: dict) -> "TapWooCommerce":
+        """Return the tap of one store, starting from its part of the state."""
+        store_id = store_config["store_id"]
+        for key in STORE_FILE_SETTINGS:
+            path = store_config.get(key)
+            if path and path != "memory" and os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+        return TapWooCommerce(
+            config={k: v for k, v in store_config.items() if k != "store_id"},
+            catalog=self.input_catalog.to_dict() if self.input_catalog else None,
+            state=self._store_states.get(store_id, {}),
+        )
+
+    def sync_store(self, store_config: dict) -> Tuple[str, dict]:
+        """Sync one store into its own output file and return its final state."""
+        store_id = store_config["store_id"]
+        output_dir = self.config.get("stores_output_dir", "output")
+        os.makedirs(output_dir, exist_ok=True)
+        output_file = f"{store_id}.jsonl"
+        if self.config.get("output_gzip"):
+            output_file += ".gz"
+        # Polling cycles add to the output of the previous ones.
+        mode = "ab" if self.config.get("poll_interval") else "wb"
+        with open(os.path.join(output_dir, output_file), mode) as output:
+            store_tap = self.make_store_tap(store_config)
+            store_tap.message_writer = MessageWriter.from_config(
+                store_config, output
+            )
+            store_tap._memory_budget = self.memory_budget
+            store_tap.sync_all()
+        return store_id, store_tap.state
+
+    def sync_stores(self) -> None:
+        """Sync all configured stores over a shared pool of workers.
+
+        Stores are picked up in order as workers free up. Each store writes its
+        messages to `<stores_output_dir>/<store_id>.jsonl`, and the state of
+        all stores is emitted on stdout, keyed by store id, as stores finish.
+        """
+        store_states = dict(self._store_states)
+        failed_stores = []
+        with ThreadPoolExecutor(max_workers=self.config.get("max_workers", 4)) as pool:
+            futures = {
+                pool.submit(self.sync_store, store_config): store_config["store_id"]
+                for store_config in self.get_store_configs()
+            }
+            for future in as_completed(futures):
+                store_id = futures[future]
+                try:
+                    store_id, store_state = future.result()
+                except Exception:
+                    self.logger.exception(f"Sync of store {store_id} failed.")
+                    failed_stores.append(store_id)
+                    continue
+                store_states[store_id] = store_state
+                self.message_writer.write_message(
+                    StateMessage(value={"stores": store_states})
+                )
+        self._store_states = store_states
+        if failed_stores:
+            raise RuntimeError(f"Sync failed for stores: {', '.join(failed_stores)}")
+
 
 if __name__ == "__main__":
     TapWooCommerce.cli()
@@ -0,0 +1,265 @@
+"""A minimal in-process WooCommerce REST API for tests and benchmarks."""
+
+import io
+import json
+import math
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from tap_woocommerce.tap import TapWooCommerce
+from tap_woocommerce.writer import MessageWriter
+
+API_PREFIX = "/wp-json/wc/v3/"
+
+
+def make_order(order_id: int, date_modified: str, line_items: int = 3) -> dict:
+    """Return an order shaped like the WooCommerce REST API returns it."""
+    address = {
+        "first_name": "Jane",
+        "last_name": "Doe",
+        "company": "",
+        "address_1": "1 Main Street",
+        "address_2": "",
+        "city": "Springfield",
+        "state": "CA",
+        "postcode": "90210",
+        "country": "US",
+    }
+    return {
+        "id": order_id,
+        "parent_id": 0,
+        "number": str(order_id),
+        "order_key": f"wc_order_{order_id:08d}",
+        "created_via": "checkout",
+        "version": "8.0.0",
+        "status": "processing",
+        "currency": "USD",
+        "currency_symbol": "$",
+        "date_created": date_modified,
+        "date_created_gmt": date_modified,
+        "date_modified": date_modified,
+        "date_modified_gmt": date_modified,
+        "discount_total": "0.00",
+        "discount_tax": "0.00",
+        "shipping_total": "10.00",
+        "shipping_tax": "0.00",
+        "cart_tax": "1.35",
+        "total": "29.35",
+        "total_tax": "1.35",
+        "prices_include_tax": False,
+        "customer_id": 7,
+        "customer_ip_address": "203.0.113.7",
+        "customer_user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+        "customer_note": "",
+        "billing": {**address, "email": "jane@example.com", "phone": "555-0100"},
+        "shipping": address,
+        "payment_method": "stripe",
+        "payment_method_title": "Credit card",
+        "transaction_id": f"ch_{order_id}",
+        "date_paid": date_modified,
+        "date_paid_gmt": date_modified,
+        "date_completed": None,
+        "date_completed_gmt": None,
+        "cart_hash": "0123456789abcdef",
+        "meta_data": [
+            {"id": 1, "key": "_wc_order_attribution_source_type", "value": "organic"},
+            {"id": 2, "key": "_stripe_fee", "value": "1.15"},
+            {"id": 3, "key": "_plugin_blob", "value": {"settings": ["x"] * 20}},
+        ],
+        "line_items": [
+            {
+                "id": order_id * 100 + line,
+                "name": f"Product {line}",
+                "product_id": 10 + line,
+                "variation_id": 0,
+                "quantity": 1,
+                "tax_class": "",
+                "subtotal": "6.00",
+                "subtotal_tax": "0.45",
+                "total": "6.00",
+                "total_tax": "0.45",
+                "taxes": [{"id": 1, "total": "0.45", "subtotal": "0.45"}],
+                "meta_data": [],
+                "sku": f"SKU-{line}",
+                "price": 6,
+            }
+            for line in range(line_items)
+        ],
+        "tax_lines": [
+            {
+                "id": 1,
+                "rate_code": "US-CA-TAX-1",
+                "rate_id": 1,
+                "label": "Tax",
+                "compound": False,
+                "tax_total": "1.35",
+                "shipping_tax_total": "0.00",
+            }
+        ],
+        "shipping_lines": [
+            {
+                "id": order_id * 100 + 99,
+                "method_title": "Flat rate",
+                "method_id": "flat_rate",
+                "total": "10.00",
+                "total_tax": "0.00",
+                "taxes": [],
+            }
+        ],
+        "fee_lines": [],
+        "coupon_lines": [],
+        "refunds": [],
+        "_links": {
+            "self": [{"href": f"https://example.com/wp-json/wc/v3/orders/{order_id}"}],
+            "collection": [{"href": "https://example.com/wp-json/wc/v3/orders"}],
+        },
+    }
+
+
+class FakeStore:
+    """Serves `resources`, a map of endpoint path to records, like WooCommerce.
+
+    Supports paging (`page`, `per_page`, `offset`), `orderby` (`id`, `modified`),
+    `order`, `modified_after`, `include` and `_fields`, and sets `X-WP-Total`
+    and `X-WP-TotalPages`. Unknown endpoints answer 404. `fail` may return a
+    status code to answer a request with instead.
+    """
+
+    def __init__(self, resources: Dict[str, List[dict]]) -> None:
+        """Bind the server to a free local port; it starts serving on `with`."""
+        self.resources = resources
+        self.requests: List[str] = []
+        self.fail: Optional[Callable[[str, dict], Optional[int]]] = None
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Return the site URL to configure the tap with."""
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self) -> "FakeStore":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def requests_to(self, pattern: str) -> List[str]:
+        """Return the logged requests whose path matches a regex."""
+        return [path for path in self.requests if re.search(pattern, path)]
+
+    def _handler_class(self) -> type:
+        store = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                status, headers, body = store.handle(self.path)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return Handler
+
+    def handle(self, raw_path: str):
+        """Return the status, headers and body answering a GET of `raw_path`."""
+        parts = urlsplit(raw_path)
+        path = parts.path.replace(API_PREFIX, "", 1).strip("/")
+        params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        with self.lock:
+            self.requests.append(raw_path)
+        if self.fail is not None:
+            status = self.fail(path, params)
+            if status:
+                return status, {}, {"code": "error"}
+        if path == "system_status":
+            return 200, {}, {"environment": {"version": "8.0.0"}}
+        if path not in self.resources:
+            return 404, {}, {"code": "rest_no_route"}
+        records = list(self.resources[path])
+        if "modified_after" in params:
+            records = [
+                r
+                for r in records
+                if (r.get("date_modified") or "") > params["modified_after"]
+            ]
+        if "include" in params:
+            ids = {int(i) for i in params["include"].split(",")}
+            records = [r for r in records if r["id"] in ids]
+        orderby = {"modified": "date_modified"}.get(params.get("orderby"), "id")
+        records.sort(
+            key=lambda r: (r.get(orderby) or "", r["id"]),
+            reverse=params.get("order") == "desc",
+        )
+        per_page = int(params.get("per_page", 10))
+        offset = int(params.get("offset", (int(params.get("page", 1)) - 1) * per_page))
+        page = records[offset:][:per_page]
+        if "_fields" in params:
+            fields = params["_fields"].split(",")
+            page = [{key: r[key] for key in fields if key in r} for r in page]
+        headers = {
+            "X-WP-Total": str(len(records)),
+            "X-WP-TotalPages": str(max(1, math.ceil(len(records) / per_page))),
+        }
+        return 200, headers, page
+
+
+def store_config(store: FakeStore, **settings) -> dict:
+    """Return a tap config for a fake store."""
+    return {
+        "site_url": store.url,
+        "consumer_key": "ck",
+        "consumer_secret": "cs",
+        "start_date": "2000-01-01T00:00:00Z",
+        "user_agent": "tests",
+        **settings,
+    }
+
+
+def run_tap(
+    config: dict, state: Optional[dict] = None, catalog: Optional[dict] = None
+) -> Tuple[List[dict], TapWooCommerce]:
+    """Run a sync and return the messages written and the tap."""
+    tap = TapWooCommerce(config=config, state=state, catalog=catalog)
+    output = io.BytesIO()
+    tap.message_writer = MessageWriter(output)
+    try:
+        tap.sync_all()
+    finally:
+        tap.messages = [json.loads(line) for line in output.getvalue().splitlines()]
+    return tap.messages, tap
+
+
+def select_streams(config: dict, streams: List[str]) -> dict:
+    """Return the discovered catalog with only the given streams selected."""
+    catalog = TapWooCommerce(config=config).catalog_dict
+    for entry in catalog["streams"]:
+        for metadata in entry["metadata"]:
+            if not metadata["breadcrumb"]:
+                metadata["metadata"]["selected"] = entry["tap_stream_id"] in streams
+    return catalog
+
+
+def records_of(messages: List[dict], stream: str) -> List[dict]:
+    """Return the records written for a stream."""
+    return [
+        m["record"] for m in messages if m["type"] == "RECORD" and m["stream"] == stream
+    ]
+
+
+def last_state(messages: List[dict]) -> dict:
+    """Return the value of the last STATE message."""
+    return [m["value"] for m in messages if m["type"] == "STATE"][-1]
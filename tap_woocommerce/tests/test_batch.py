@@ -0,0 +1,73 @@
+"""Tests of writing records to batch files."""
+
+import gzip
+import io
+import json
+
+import singer
+
+from tap_woocommerce.batch import BatchWriter
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    run_tap,
+    select_streams,
+    store_config,
+)
+from tap_woocommerce.writer import MessageWriter
+
+
+def make_coupon(coupon_id: int) -> dict:
+    return {
+        "id": coupon_id,
+        "code": f"CODE{coupon_id}",
+        "date_modified": f"2024-01-{coupon_id:02d}T10:00:00",
+    }
+
+
+def read_batch(message: dict) -> list:
+    with gzip.open(message["filepath"]) as batch:
+        return [json.loads(line)["record"] for line in batch]
+
+
+def test_batches_roll_over_and_state_waits_for_them(tmp_path):
+    with FakeStore({"coupons": [make_coupon(i) for i in range(1, 11)]}) as store:
+        config = store_config(
+            store,
+            batch_output_dir=str(tmp_path),
+            batch_size=4,
+            per_page=3,
+            state_every_records=1,
+        )
+        messages, _ = run_tap(config, catalog=select_streams(config, ["coupons"]))
+
+    assert not [m for m in messages if m["type"] == "RECORD"]
+    batches = [m for m in messages if m["type"] == "BATCH"]
+    assert [m["batch_size"] for m in batches] == [4, 4, 2]
+    # No bookmark ever covers records that are not in a complete batch file.
+    covered = ""
+    for message in messages:
+        if message["type"] == "BATCH":
+            covered = max(r["date_modified"] for r in read_batch(message))
+        elif message["type"] == "STATE":
+            bookmark = message["value"].get("bookmarks", {}).get("coupons", {})
+            bookmark = bookmark.get("progress_markers", bookmark)
+            assert bookmark.get("replication_key_value", "") <= covered
+    assert [r["id"] for m in batches for r in read_batch(m)] == list(range(1, 11))
+
+
+def test_state_is_deferred_until_the_batches_are_flushed(tmp_path):
+    output = io.BytesIO()
+    writer = BatchWriter(MessageWriter(output), str(tmp_path))
+    written = []
+
+    assert not writer.defer_state("coupons", lambda: written.append("before"))
+    writer.write(singer.RecordMessage(stream="coupons", record={"id": 1}))
+    assert writer.defer_state("coupons", lambda: written.append("first"))
+    assert writer.defer_state("coupons", lambda: written.append("second"))
+    assert written == []
+
+    writer.flush()
+
+    assert written == ["second"]
+    types = [json.loads(line)["type"] for line in output.getvalue().splitlines()]
+    assert types == ["BATCH"]
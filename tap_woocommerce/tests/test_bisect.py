@@ -0,0 +1,88 @@
+"""Tests of skipping the records that break their page."""
+
+import io
+
+import pytest
+
+from tap_woocommerce.client import ServerAPIError
+from tap_woocommerce.tap import TapWooCommerce
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    make_order,
+    records_of,
+    run_tap,
+    store_config,
+)
+from tap_woocommerce.writer import MessageWriter
+
+
+def breaks_on(*order_ids):
+    """Return a failure hook answering 500 to full pages holding these orders."""
+
+    def fail(path, params):
+        if path != "orders" or "_fields" in params:
+            return None
+        per_page = int(params.get("per_page", 10))
+        offset = int(params.get("offset", (int(params.get("page", 1)) - 1) * per_page))
+        # Orders are listed by id, which matches their `date_modified` order.
+        if any(offset < order_id <= offset + per_page for order_id in order_ids):
+            return 500
+        return None
+
+    return fail
+
+
+@pytest.fixture
+def store():
+    orders = [make_order(i, f"2024-01-01T10:00:{i:02d}") for i in range(1, 11)]
+    notes = {f"orders/{order['id']}/notes": [] for order in orders}
+    with FakeStore({"orders": orders, **notes}) as store:
+        yield store
+
+
+def bisect_config(store, **settings):
+    return store_config(
+        store,
+        bisect_poison_pages=True,
+        poison_page_retries=1,
+        per_page=5,
+        probe_filters=False,
+        **settings,
+    )
+
+
+def test_broken_records_are_skipped(store):
+    store.fail = breaks_on(3)
+
+    messages, tap = run_tap(bisect_config(store))
+
+    ids = [r["id"] for r in records_of(messages, "orders")]
+    assert ids == [1, 2, 4, 5, 6, 7, 8, 9, 10]
+    assert tap.streams["orders"].poison_record_ids == [3]
+
+
+def test_failing_endpoint_is_not_bisected_away(store):
+    store.fail = lambda path, params: 500 if path == "orders" else None
+
+    with pytest.raises(ServerAPIError):
+        run_tap(bisect_config(store))
+
+    assert len(store.requests_to(r"/orders\?")) < 10
+
+
+def test_page_with_too_many_broken_records_fails(store):
+    store.fail = breaks_on(1, 2, 3)
+
+    with pytest.raises(ServerAPIError):
+        run_tap(bisect_config(store))
+
+
+def test_bisection_failures_count_towards_the_circuit_breaker(store):
+    store.fail = lambda path, params: 500 if path == "orders" else None
+    tap = TapWooCommerce(config=bisect_config(store, circuit_breaker_threshold=2))
+    tap.message_writer = MessageWriter(io.BytesIO())
+
+    with pytest.raises(Exception):
+        tap.sync_all()
+
+    assert not tap.streams["orders"].circuit_breaker.allow_request()
@@ -0,0 +1,68 @@
+"""Tests of recording and replaying HTTP exchanges."""
+
+import gzip
+
+import pytest
+import requests
+
+from tap_woocommerce.cassette import Cassette, build_response, request_key
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    make_order,
+    records_of,
+    run_tap,
+    store_config,
+)
+
+URL = "https://example.com/wp-json/wc/v3/orders"
+
+
+def prepare(url: str) -> requests.PreparedRequest:
+    return requests.Request("GET", url).prepare()
+
+
+def respond(url: str, content: bytes) -> requests.Response:
+    return build_response(prepare(url), 200, "OK", {}, content, 0.1)
+
+
+def test_requests_match_without_credentials_or_param_order():
+    assert request_key("GET", f"{URL}?page=2&consumer_key=ck&per_page=10") == (
+        request_key("GET", f"{URL}?per_page=10&page=2&consumer_secret=other")
+    )
+    assert request_key("GET", f"{URL}?page=2") != request_key("GET", f"{URL}?page=3")
+
+
+def test_repeated_requests_replay_in_order(tmp_path):
+    path = str(tmp_path / "cassette.jsonl.gz")
+    cassette = Cassette(path, "record")
+    for content in (b"[1]", b"[2]"):
+        cassette.record(prepare(f"{URL}?consumer_key=ck"), respond(URL, content))
+    cassette.record(prepare(f"{URL}?page=2"), respond(URL, b"\xff\xfe"))
+    cassette.close()
+    with gzip.open(path, "rt") as recorded:
+        assert "consumer_key" not in recorded.read()
+
+    cassette = Cassette(path, "replay")
+    replies = [cassette.replay(prepare(f"{URL}?consumer_key=x")) for _ in range(3)]
+
+    assert [reply.content for reply in replies] == [b"[1]", b"[2]", b"[2]"]
+    assert cassette.replay(prepare(f"{URL}?page=2")).content == b"\xff\xfe"
+    with pytest.raises(LookupError):
+        cassette.replay(prepare(f"{URL}?page=3"))
+
+
+def test_replayed_sync_matches_the_recorded_one(tmp_path):
+    path = str(tmp_path / "cassette.jsonl.gz")
+    orders = [make_order(i, f"2024-01-0{i}T10:00:00") for i in range(1, 4)]
+    notes = {f"orders/{order['id']}/notes": [] for order in orders}
+    with FakeStore({"orders": orders, **notes}) as store:
+        config = store_config(
+            store, http_cassette=path, http_cassette_mode="record", per_page=2
+        )
+        recorded, _ = run_tap(config)
+
+    # The store is gone, every response comes from the cassette.
+    replayed, _ = run_tap({**config, "http_cassette_mode": "replay"})
+
+    assert records_of(replayed, "orders") == records_of(recorded, "orders")
+    assert len(records_of(replayed, "orders")) == 3
@@ -0,0 +1,81 @@
+"""Tests of syncing top-level streams in parallel threads."""
+
+import io
+import json
+import threading
+
+import pytest
+
+from tap_woocommerce.tap import TapWooCommerce
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    last_state,
+    make_order,
+    records_of,
+    run_tap,
+    select_streams,
+    store_config,
+)
+from tap_woocommerce.writer import MessageWriter
+
+
+def make_coupon(coupon_id: int, date_modified: str) -> dict:
+    return {"id": coupon_id, "code": f"CODE{coupon_id}", "date_modified": date_modified}
+
+
+@pytest.fixture
+def store():
+    orders = [make_order(i, f"2024-01-{i:02d}T10:00:00") for i in range(1, 21)]
+    coupons = [make_coupon(i, f"2024-02-{i:02d}T10:00:00") for i in range(1, 21)]
+    with FakeStore({"orders": orders, "coupons": coupons}) as store:
+        yield store
+
+
+def test_concurrent_sync_matches_sequential_sync(store):
+    config = store_config(store, per_page=5, state_every_records=3)
+    catalog = select_streams(config, ["orders", "coupons"])
+
+    sequential, _ = run_tap(config, catalog=catalog)
+    concurrent, _ = run_tap({**config, "concurrent_streams": True}, catalog=catalog)
+
+    for stream in ("orders", "coupons"):
+        assert records_of(concurrent, stream) == records_of(sequential, stream)
+    assert last_state(concurrent) == last_state(sequential)
+    # Every STATE message only moves bookmarks forward.
+    seen: dict = {}
+    for message in concurrent:
+        if message["type"] != "STATE":
+            continue
+        for stream, bookmark in message["value"].get("bookmarks", {}).items():
+            value = bookmark.get("replication_key_value")
+            if value is None:
+                continue
+            assert value >= seen.get(stream, "")
+            seen[stream] = value
+
+
+def test_tree_publishes_only_its_own_bookmarks(store):
+    tap = TapWooCommerce(config=store_config(store))
+    output = io.BytesIO()
+    tap.message_writer = MessageWriter(output)
+    tap._stream_trees = {"orders": ["orders"], "coupons": ["coupons"]}
+    tap._state_lock = threading.Lock()
+    tap._published_state = {"bookmarks": {}}
+    bookmarks = tap.state.setdefault("bookmarks", {})
+
+    bookmarks["orders"] = {"replication_key_value": "2024-01-01"}
+    bookmarks["coupons"] = {"replication_key_value": "2024-02-01"}
+    tap.write_state_message(tap.streams["orders"], force=True)
+    # Orders moves on in its thread without publishing, then coupons publishes.
+    bookmarks["orders"] = {"replication_key_value": "2024-01-02"}
+    bookmarks["coupons"] = {"replication_key_value": "2024-02-05"}
+    tap.write_state_message(tap.streams["coupons"], force=True)
+
+    first, second = [
+        json.loads(line)["value"] for line in output.getvalue().splitlines()
+    ]
+    assert first["bookmarks"] == {"orders": {"replication_key_value": "2024-01-01"}}
+    assert second["bookmarks"] == {
+        "orders": {"replication_key_value": "2024-01-01"},
+        "coupons": {"replication_key_value": "2024-02-05"},
+    }
@@ -0,0 +1,49 @@
+"""Tests of the specialized record conformers and validators."""
+
+import copy
+
+from singer_sdk.helpers._catalog import pop_deselected_record_properties
+from singer_sdk.helpers._typing import conform_record_data_types
+
+from tap_woocommerce.streams import OrdersStream
+from tap_woocommerce.tap import TapWooCommerce
+from tap_woocommerce.tests.fake_store import FakeStore, make_order, store_config
+
+
+def make_stream(**settings) -> OrdersStream:
+    with FakeStore({"orders": []}) as store:
+        return OrdersStream(tap=TapWooCommerce(config=store_config(store, **settings)))
+
+
+def test_conformer_matches_sdk_conformance():
+    stream = make_stream()
+    order = stream.record_transformer(make_order(1, "2024-01-01T10:00:00"), None)
+    expected = copy.deepcopy(order)
+    pop_deselected_record_properties(
+        expected, stream.schema, stream.mask, stream.logger
+    )
+    expected = conform_record_data_types(
+        stream.name, expected, stream.schema, stream.logger
+    )
+
+    assert stream.record_conformer(order) == expected
+
+
+def test_trusted_conformer_drops_unmapped_properties():
+    stream = make_stream(trusted_streams=["orders"])
+    order = stream.record_transformer(make_order(1, "2024-01-01T10:00:00"), None)
+
+    conformed = stream.record_conformer(order)
+
+    assert "_links" not in conformed
+    assert set(conformed) <= set(stream.schema["properties"])
+
+
+def test_validator_reports_mismatches():
+    stream = make_stream()
+    order = stream.record_conformer(
+        stream.record_transformer(make_order(1, "2024-01-01T10:00:00"), None)
+    )
+
+    assert stream.record_validator(order) == []
+    assert stream.record_validator({**order, "id": "one"})
@@ -0,0 +1,80 @@
+"""Tests of the suppression of unchanged records by the emitted index."""
+
+import copy
+
+import pytest
+
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    last_state,
+    make_order,
+    records_of,
+    run_tap,
+    store_config,
+)
+
+
+@pytest.fixture
+def store():
+    orders = [make_order(i, f"2024-01-0{i}T10:00:00") for i in range(1, 6)]
+    notes = {
+        f"orders/{order['id']}/notes": [
+            {"id": order["id"] * 10, "note": "Paid", "date_created": "2024-01-01"}
+        ]
+        for order in orders
+    }
+    with FakeStore({"orders": orders, **notes}) as store:
+        yield store
+
+
+def rewind(state: dict) -> dict:
+    """Return a state whose orders bookmark starts over."""
+    state = copy.deepcopy(state)
+    del state["bookmarks"]["orders"]["replication_key_value"]
+    return state
+
+
+def test_parent_and_child_share_the_index(store, tmp_path):
+    config = store_config(store, emitted_index_path=str(tmp_path / "index.db"))
+
+    messages, _ = run_tap(config)
+
+    assert len(records_of(messages, "orders")) == 5
+    assert len(records_of(messages, "order_notes")) == 5
+
+
+def test_unchanged_records_are_not_emitted_again(store, tmp_path):
+    config = store_config(store, emitted_index_path=str(tmp_path / "index.db"))
+    messages, _ = run_tap(config)
+    store.resources["orders"][0]["date_modified"] = "2024-02-01T10:00:00"
+
+    messages, _ = run_tap(config, state=rewind(last_state(messages)))
+
+    assert [r["id"] for r in records_of(messages, "orders")] == [1]
+
+
+def test_entries_of_unconfirmed_states_are_discarded(store, tmp_path):
+    config = store_config(store, emitted_index_path=str(tmp_path / "index.db"))
+    messages, _ = run_tap(config)
+    first_state = last_state(messages)
+    store.resources["orders"][0]["date_modified"] = "2024-02-01T10:00:00"
+    run_tap(config, state=rewind(first_state))
+
+    # The target never saw the second run, so order 1 is emitted again.
+    messages, _ = run_tap(config, state=rewind(first_state))
+    assert [r["id"] for r in records_of(messages, "orders")] == [1]
+
+    messages, _ = run_tap(config)
+    assert len(records_of(messages, "orders")) == 5
+
+
+def test_lines_of_unchanged_orders_are_not_emitted_again(store, tmp_path):
+    config = store_config(store, emitted_index_path=str(tmp_path / "index.db"))
+    messages, _ = run_tap(config)
+    assert len(records_of(messages, "order_line_items")) == 15
+    store.resources["orders"][0]["date_modified"] = "2024-02-01T10:00:00"
+
+    messages, _ = run_tap(config, state=rewind(last_state(messages)))
+
+    lines = records_of(messages, "order_line_items")
+    assert [line["order_id"] for line in lines] == [1, 1, 1]
@@ -0,0 +1,38 @@
+"""Tests of probing whether the store honours `modified_after`."""
+
+import pytest
+
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    last_state,
+    make_order,
+    records_of,
+    run_tap,
+    store_config,
+)
+
+
+@pytest.fixture
+def store():
+    orders = [make_order(i, f"2024-01-0{i}T10:00:00") for i in range(1, 4)]
+    notes = {f"orders/{order['id']}/notes": [] for order in orders}
+    with FakeStore({"orders": orders, **notes}) as store:
+        yield store
+
+
+def test_probe_filters_on_a_fixed_date(store):
+    messages, _ = run_tap(store_config(store))
+
+    assert store.requests_to(r"/orders\?.*modified_after=2100-01-01T00%3A00%3A00")
+    assert last_state(messages)["bookmarks"]["orders"]["modified_after_supported"]
+
+
+def test_failed_probe_is_retried_next_time(store):
+    store.fail = lambda path, params: 500 if params.get("per_page") == "1" else None
+    config = store_config(store, bisect_poison_pages=True, poison_page_retries=1)
+
+    messages, _ = run_tap(config)
+
+    assert len(records_of(messages, "orders")) == 3
+    bookmark = last_state(messages)["bookmarks"]["orders"]
+    assert "modified_after_supported" not in bookmark
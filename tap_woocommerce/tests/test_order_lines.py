@@ -0,0 +1,56 @@
+"""Tests of the streams derived from the lines of orders."""
+
+import pytest
+from jsonschema import Draft4Validator
+
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    make_order,
+    records_of,
+    run_tap,
+    store_config,
+)
+
+LINE_STREAMS = [
+    "order_line_items",
+    "order_shipping_lines",
+    "order_fee_lines",
+    "order_coupon_lines",
+]
+
+
+@pytest.fixture
+def store():
+    orders = [make_order(i, f"2024-01-0{i}T10:00:00") for i in range(1, 4)]
+    notes = {f"orders/{order['id']}/notes": [] for order in orders}
+    with FakeStore({"orders": orders, **notes}) as store:
+        yield store
+
+
+def test_line_records_match_the_announced_schemas(store):
+    messages, _ = run_tap(store_config(store))
+
+    schemas = {m["stream"]: m["schema"] for m in messages if m["type"] == "SCHEMA"}
+    for stream in LINE_STREAMS:
+        Draft4Validator.check_schema(schemas[stream])
+        validator = Draft4Validator(schemas[stream])
+        for record in records_of(messages, stream):
+            validator.validate(record)
+    assert len(records_of(messages, "order_line_items")) == 9
+
+
+def test_line_streams_make_no_requests(store, capsys):
+    run_tap(store_config(store, plan_only=True))
+
+    # Discovery of the orders and order notes streams only.
+    assert len(store.requests_to(r"/orders$")) == 2
+    rows = [line.split() for line in capsys.readouterr().out.splitlines()]
+    planned = {row[0]: row[2] for row in rows if row[0] in LINE_STREAMS}
+    assert planned == dict.fromkeys(LINE_STREAMS, "0")
+
+
+def test_line_streams_need_the_orders_stream():
+    with FakeStore({"coupons": []}) as store:
+        messages, tap = run_tap(store_config(store))
+
+    assert not set(LINE_STREAMS) & set(tap.streams)
@@ -0,0 +1,126 @@
+"""Tests of spreading requests over several origins."""
+
+import random
+import threading
+
+import pytest
+
+from tap_woocommerce.origins import Origin, OriginPool
+from tap_woocommerce.resilience import CircuitBreaker
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    make_order,
+    records_of,
+    run_tap,
+    select_streams,
+    store_config,
+)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("tap_woocommerce.resilience.time.monotonic", clock)
+    return clock
+
+
+def make_pool(*weights: float, max_concurrency: int = 4) -> OriginPool:
+    return OriginPool(
+        [
+            Origin(
+                f"https://origin{i}.example.com",
+                weight,
+                max_concurrency,
+                CircuitBreaker(2, 60),
+            )
+            for i, weight in enumerate(weights)
+        ]
+    )
+
+
+def test_origins_are_picked_in_proportion_to_their_weight():
+    random.seed(1)
+    pool = make_pool(3, 1)
+    picks = []
+    for _ in range(4000):
+        origin = pool.acquire()
+        picks.append(origin.url)
+        pool.release(origin, healthy=True)
+
+    share = picks.count("https://origin0.example.com") / len(picks)
+    assert 0.7 < share < 0.8
+
+
+def test_origins_with_a_free_slot_are_preferred():
+    pool = make_pool(1000, 1, max_concurrency=1)
+    heavy, light = pool.origins
+
+    assert pool.acquire() is heavy
+    assert pool.acquire() is light
+
+    # With every slot taken, the next request waits for any of them.
+    acquired = []
+    waiter = threading.Thread(
+        target=lambda: acquired.append(pool.acquire()), daemon=True
+    )
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+    pool.release(light, healthy=True)
+    waiter.join(5)
+    assert acquired == [light]
+
+
+def test_failing_origin_is_dropped_until_its_cooldown_ends(clock):
+    pool = make_pool(1000, 1)
+    failing, healthy = pool.origins
+    for _ in range(2):
+        pool.release(pool.acquire(), healthy=False)
+
+    assert all(pool.acquire() is healthy for _ in range(4))
+    for _ in range(4):
+        pool.release(healthy, healthy=True)
+
+    clock.now += 61
+    probe = pool.acquire()
+    assert probe is failing
+    # Only one request checks whether it recovered.
+    assert pool.acquire() is healthy
+    pool.release(healthy, healthy=True)
+    pool.release(probe, healthy=True)
+    assert pool.acquire() is failing
+
+
+def test_all_origins_down_leaves_no_origin(clock):
+    pool = make_pool(1, 1)
+    for origin in pool.origins:
+        for _ in range(2):
+            origin.slots.acquire()
+            pool.release(origin, healthy=False)
+
+    assert pool.acquire() is None
+
+
+def test_pages_are_spread_over_the_origins():
+    orders = [make_order(i, f"2024-01-{i:02d}T10:00:00") for i in range(1, 21)]
+    with FakeStore({"orders": orders}) as first, FakeStore(
+        {"orders": orders}
+    ) as second:
+        config = store_config(
+            first,
+            origins=[{"url": first.url}, {"url": second.url}],
+            per_page=2,
+            probe_filters=False,
+        )
+        messages, _ = run_tap(config, catalog=select_streams(config, ["orders"]))
+
+    assert [r["id"] for r in records_of(messages, "orders")] == list(range(1, 21))
+    assert first.requests_to(r"/orders\?") and second.requests_to(r"/orders\?")
@@ -0,0 +1,97 @@
+"""Tests of passing records through from the response without decoding them."""
+
+import json
+import re
+
+import pytest
+from jsonschema import Draft4Validator
+
+from tap_woocommerce.client import split_records, top_level_value
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    last_state,
+    make_order,
+    records_of,
+    run_tap,
+    select_streams,
+    store_config,
+)
+
+
+def make_coupon(coupon_id: int, date_modified: str) -> dict:
+    return {
+        "id": coupon_id,
+        "code": f"SAVE{coupon_id}",
+        "amount": "10.00",
+        "date_created": date_modified,
+        "date_modified": date_modified,
+        "discount_type": "percent",
+        "description": 'Says "{not an object}"',
+        "usage_count": 0,
+        "individual_use": False,
+        "product_ids": [],
+        "email_restrictions": [],
+        "used_by": [],
+        "_links": {"self": [{"href": f"https://example.com/coupons/{coupon_id}"}]},
+    }
+
+
+@pytest.mark.parametrize(
+    "records",
+    [
+        [{"id": 1, "note": 'a "quoted" word'}, {"id": 2, "note": "back\\slash\\"}],
+        [{"id": 1, "note": "{[}"}, {"id": 2, "note": "}}"}],
+        [{"id": 1, "lines": [{"date_modified": "2099-01-01", "meta": {"k": {}}}]}],
+        [{"id": 1, "deep": json.loads('{"a":' * 10 + "{}" + "}" * 10)}, {"id": 2}],
+        [],
+    ],
+)
+def test_split_records_matches_json(records):
+    for body in [json.dumps(records), json.dumps(records, separators=(",", ":"))]:
+        spans = list(split_records(body.encode()))
+
+        assert [json.loads(span) for span in spans] == records
+
+
+def test_bookmark_comes_from_the_record_itself():
+    pattern = re.compile(rb'"date_modified"\s*:\s*"([^"]*)"')
+    span = json.dumps(
+        {
+            "lines": [{"date_modified": "2099-01-01T00:00:00"}],
+            "note": '"date_modified": "2098-01-01T00:00:00"',
+            "date_modified": "2024-01-01T10:00:00",
+        }
+    ).encode()
+
+    assert top_level_value(span, pattern) == "2024-01-01T10:00:00"
+    assert top_level_value(b'{"lines": [{"date_modified": "x"}]}', pattern) is None
+
+
+def test_passed_through_records_match_the_announced_schema():
+    coupons = [make_coupon(i, f"2024-01-0{i}T10:00:00") for i in range(1, 4)]
+    with FakeStore({"coupons": coupons}) as store:
+        config = store_config(store, passthrough_streams=["coupons"])
+        messages, tap = run_tap(config, catalog=select_streams(config, ["coupons"]))
+
+    assert tap.streams["coupons"].passthrough
+    assert store.requests_to(r"/coupons\?.*_fields=id%2Ccode")
+    schema = [m["schema"] for m in messages if m["type"] == "SCHEMA"][0]
+    records = records_of(messages, "coupons")
+    assert [record["id"] for record in records] == [1, 2, 3]
+    for record in records:
+        assert "_links" not in record
+        Draft4Validator(schema).validate(record)
+    bookmark = last_state(messages)["bookmarks"]["coupons"]
+    assert bookmark["replication_key_value"] == "2024-01-03T10:00:00"
+
+
+def test_streams_deriving_from_their_records_are_decoded():
+    orders = [make_order(i, f"2024-01-0{i}T10:00:00") for i in range(1, 4)]
+    with FakeStore({"orders": orders}) as store:
+        config = store_config(store, passthrough_streams=["orders"])
+        messages, tap = run_tap(config, catalog=select_streams(config, ["orders"]))
+
+    assert not tap.streams["orders"].passthrough
+    records = records_of(messages, "orders")
+    assert [record["id"] for record in records] == [1, 2, 3]
+    assert "_links" not in records[0]
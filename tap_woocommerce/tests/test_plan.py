@@ -0,0 +1,54 @@
+"""Tests of estimating a sync without running it."""
+
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    make_order,
+    run_tap,
+    store_config,
+)
+
+
+def test_plan_only_estimates_from_the_bookmark(capsys):
+    orders = [make_order(i, f"2024-01-0{i}T10:00:00") for i in range(1, 6)]
+    state = {
+        "bookmarks": {
+            "orders": {
+                "replication_key": "date_modified",
+                "replication_key_value": "2024-01-03T10:00:00",
+            }
+        }
+    }
+    with FakeStore({"orders": orders}) as store:
+        messages, _ = run_tap(
+            store_config(store, plan_only=True, per_page=1), state=state
+        )
+
+    assert messages == []
+    rows = [line.split() for line in capsys.readouterr().out.splitlines()]
+    assert ["orders", "2", "2"] in [row[:3] for row in rows]
+
+
+def test_plan_only_estimates_every_store(capsys):
+    first = FakeStore({"orders": [make_order(1, "2024-01-01T10:00:00")]})
+    second = FakeStore(
+        {"orders": [make_order(i, "2024-01-01T10:00:00") for i in range(2, 5)]}
+    )
+    with first, second:
+        config = {
+            "stores": [
+                {"store_id": "first", **store_config(first, per_page=1)},
+                {"store_id": "second", **store_config(second, per_page=1)},
+            ],
+            "plan_only": True,
+        }
+        messages, _ = run_tap(config)
+
+    assert messages == []
+    rows = [line.split() for line in capsys.readouterr().out.splitlines()]
+    orders = [row[:3] for row in rows if row[:1] in (["store"], ["orders"])]
+    assert orders == [
+        ["store", "first"],
+        ["orders", "1", "1"],
+        ["store", "second"],
+        ["orders", "3", "3"],
+    ]
@@ -0,0 +1,23 @@
+"""Tests of fetching pages ahead within the memory budget."""
+
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    make_order,
+    records_of,
+    run_tap,
+    store_config,
+)
+
+
+def test_prefetched_pages_are_emitted_in_order_within_budget():
+    orders = [make_order(i, f"2024-01-01T10:00:{i:02d}") for i in range(1, 31)]
+    notes = {f"orders/{order['id']}/notes": [] for order in orders}
+    with FakeStore({"orders": orders, **notes}) as store:
+        config = store_config(
+            store, prefetch_pages=True, per_page=5, memory_budget_bytes=1
+        )
+
+        messages, tap = run_tap(config)
+
+    assert [r["id"] for r in records_of(messages, "orders")] == list(range(1, 31))
+    assert tap.memory_budget.used == 0
@@ -0,0 +1,58 @@
+"""Tests of enriching order line items from the product cache."""
+
+import pytest
+
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    make_order,
+    records_of,
+    run_tap,
+    store_config,
+)
+
+
+def test_line_items_get_their_variation_fields():
+    order = make_order(1, "2024-01-01T10:00:00", line_items=3)
+    order["line_items"][0]["variation_id"] = 101
+    order["line_items"][1]["variation_id"] = 102
+    resources = {
+        "orders": [order],
+        "orders/1/notes": [],
+        "products": [
+            {"id": product_id, "sku": f"P{product_id}", "type": "variable"}
+            for product_id in (10, 11, 12)
+        ],
+        # Variation 102 was deleted.
+        "products/10/variations": [{"id": 101, "sku": "V101", "type": "variation"}],
+        "products/11/variations": [],
+    }
+    with FakeStore(resources) as store:
+        messages, _ = run_tap(store_config(store, product_cache="memory"))
+
+    lines = {line["id"]: line for line in records_of(messages, "order_line_items")}
+    assert lines[100]["product_sku"] == "V101"
+    assert lines[100]["product_parent_id"] == 10
+    assert lines[101]["product_sku"] is None
+    assert lines[101]["product_type"] is None
+    assert lines[102]["product_sku"] == "P12"
+    assert store.requests_to(r"/products/10/variations\?.*include=101")
+
+
+@pytest.mark.parametrize("ignore_server_errors", [False, True])
+def test_failed_lookups_leave_lines_unenriched(ignore_server_errors):
+    resources = {
+        "orders": [make_order(1, "2024-01-01T10:00:00")],
+        "orders/1/notes": [],
+        "products": [],
+    }
+    with FakeStore(resources) as store:
+        store.fail = lambda path, params: 503 if "include" in params else None
+        config = store_config(
+            store, product_cache="memory", ignore_server_errors=ignore_server_errors
+        )
+        messages, _ = run_tap(config)
+
+    assert len(store.requests_to(r"/products\?.*include=")) == 1
+    assert [r["id"] for r in records_of(messages, "orders")] == [1]
+    lines = records_of(messages, "order_line_items")
+    assert [line.get("product_sku") for line in lines] == [None, None, None]
@@ -0,0 +1,66 @@
+"""Tests of detecting deleted records by listing all IDs."""
+
+from tap_woocommerce.client import WooCommerceStream
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    last_state,
+    records_of,
+    run_tap,
+    store_config,
+)
+
+
+def make_coupon(coupon_id: int) -> dict:
+    return {
+        "id": coupon_id,
+        "code": f"CODE{coupon_id}",
+        "date_modified": "2024-01-01T10:00:00",
+    }
+
+
+def test_only_records_missing_on_recheck_are_deleted(tmp_path, monkeypatch):
+    with FakeStore({"coupons": [make_coupon(i) for i in range(1, 5)]}) as store:
+        config = store_config(
+            store,
+            reconcile_deletes=["coupons"],
+            reconcile_path=str(tmp_path / "reconcile.db"),
+        )
+        messages, _ = run_tap(config)
+        del store.resources["coupons"][1]
+        # Coupon 3 moves between pages while they are listed.
+        list_ids = WooCommerceStream.fetch_all_ids
+        monkeypatch.setattr(
+            WooCommerceStream,
+            "fetch_all_ids",
+            lambda stream: [i for i in list_ids(stream) if i != 3],
+        )
+
+        messages, _ = run_tap(config, state=last_state(messages))
+
+    deleted = [r for r in records_of(messages, "coupons") if "_sdc_deleted_at" in r]
+    assert [r["id"] for r in deleted] == [2]
+    assert store.requests_to(r"include=2%2C3|include=2,3")
+
+
+def deleted_ids(messages: list) -> list:
+    return [r["id"] for r in records_of(messages, "coupons") if "_sdc_deleted_at" in r]
+
+
+def test_deletions_are_emitted_until_their_state_is_confirmed(tmp_path):
+    with FakeStore({"coupons": [make_coupon(i) for i in range(1, 5)]}) as store:
+        config = store_config(
+            store,
+            reconcile_deletes=["coupons"],
+            reconcile_path=str(tmp_path / "reconcile.db"),
+        )
+        first_state = last_state(run_tap(config)[0])
+        del store.resources["coupons"][1]
+
+        messages, _ = run_tap(config, state=first_state)
+        assert deleted_ids(messages) == [2]
+        # The target never stored the state written with the markers.
+        messages, _ = run_tap(config, state=first_state)
+        assert deleted_ids(messages) == [2]
+
+        messages, _ = run_tap(config, state=last_state(messages))
+        assert deleted_ids(messages) == []
@@ -0,0 +1,65 @@
+"""Tests of the snapshot cache of reference streams."""
+
+import pytest
+
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    last_state,
+    records_of,
+    run_tap,
+    select_streams,
+    store_config,
+)
+
+SETTINGS_PATH = r"/settings/general\?"
+
+
+def make_setting(value: str) -> dict:
+    return {"id": "woocommerce_currency", "label": "Currency", "value": value}
+
+
+@pytest.fixture
+def store():
+    with FakeStore({"settings/general": [make_setting("USD")]}) as store:
+        yield store
+
+
+def cache_run(store, tmp_path, state=None, **settings):
+    config = store_config(store, reference_cache_path=str(tmp_path), **settings)
+    catalog = select_streams(config, ["store_settings"])
+    messages, _ = run_tap(config, state=state, catalog=catalog)
+    return messages
+
+
+def test_fresh_snapshot_skips_the_stream(store, tmp_path):
+    state = last_state(cache_run(store, tmp_path))
+    requests = len(store.requests_to(SETTINGS_PATH))
+
+    messages = cache_run(store, tmp_path, state)
+
+    assert records_of(messages, "store_settings") == []
+    assert len(store.requests_to(SETTINGS_PATH)) == requests
+
+
+@pytest.mark.parametrize("passthrough_streams", [[], ["store_settings"]])
+def test_stale_snapshot_only_emits_changed_content(
+    store, tmp_path, passthrough_streams
+):
+    settings = {"reference_cache_ttl": 0, "passthrough_streams": passthrough_streams}
+    state = last_state(cache_run(store, tmp_path, **settings))
+
+    messages = cache_run(store, tmp_path, state, **settings)
+    assert records_of(messages, "store_settings") == []
+
+    store.resources["settings/general"] = [make_setting("EUR")]
+    messages = cache_run(store, tmp_path, last_state(messages), **settings)
+    assert [r["value"] for r in records_of(messages, "store_settings")] == ["EUR"]
+
+
+def test_snapshot_without_confirmed_state_is_ignored(store, tmp_path):
+    cache_run(store, tmp_path)
+
+    # The target never stored the state of the first run.
+    messages = cache_run(store, tmp_path, state={})
+
+    assert [r["value"] for r in records_of(messages, "store_settings")] == ["USD"]
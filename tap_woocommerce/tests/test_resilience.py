@@ -0,0 +1,49 @@
+"""Tests of abandoning streams whose endpoints are unavailable."""
+
+import io
+
+import pytest
+from singer_sdk.exceptions import FatalAPIError
+
+from tap_woocommerce.tap import TapWooCommerce
+from tap_woocommerce.tests.fake_store import FakeStore, make_order, store_config
+from tap_woocommerce.writer import MessageWriter
+
+
+def test_unavailable_child_abandons_its_tree():
+    orders = [make_order(i, f"2024-01-01T10:00:{i:02d}") for i in range(1, 4)]
+    notes = {f"orders/{order['id']}/notes": [] for order in orders}
+    with FakeStore({"orders": orders, **notes}) as store:
+        store.fail = lambda path, params: 503 if path.endswith("/notes") else None
+        tap = TapWooCommerce(
+            config=store_config(store, retry_budget=0, probe_filters=False)
+        )
+        output = io.BytesIO()
+        tap.message_writer = MessageWriter(output)
+
+        with pytest.raises(FatalAPIError, match="orders"):
+            tap.sync_all()
+
+    assert tap._failed_streams == ["orders"]
+    bookmark = tap.state["bookmarks"]["orders"]
+    assert "replication_key_value" not in bookmark
+
+
+def test_retry_budget_is_renewed_every_cycle():
+    orders = [make_order(1, "2024-01-01T10:00:00")]
+    with FakeStore({"orders": orders, "orders/1/notes": []}) as store:
+        tap = TapWooCommerce(
+            config=store_config(store, retry_budget=0, probe_filters=False)
+        )
+        output = io.BytesIO()
+        tap.message_writer = MessageWriter(output)
+        store.fail = lambda path, params: 503 if path == "orders" else None
+        tap.sync_cycle()
+        assert tap._failed_streams == ["orders"]
+
+        store.fail = None
+        tap._failed_streams = []
+        tap.sync_cycle()
+
+    assert tap._failed_streams == []
+    assert b'"stream": "orders", "record": {' in output.getvalue()
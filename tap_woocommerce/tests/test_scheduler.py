@@ -0,0 +1,52 @@
+"""Tests of stopping streams at the run deadline."""
+
+from tap_woocommerce.client import WooCommerceStream
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    last_state,
+    make_order,
+    records_of,
+    run_tap,
+    select_streams,
+    store_config,
+)
+
+
+def test_records_sharing_the_last_timestamp_are_synced_next_run():
+    # Orders 2 and 3 share a timestamp but land on different pages.
+    orders = [
+        make_order(1, "2024-01-01T09:00:00"),
+        make_order(2, "2024-01-01T10:00:00"),
+        make_order(3, "2024-01-01T10:00:00"),
+    ]
+    notes = {f"orders/{order['id']}/notes": [] for order in orders}
+    with FakeStore({"orders": orders, **notes}) as store:
+        config = store_config(store, per_page=2, probe_filters=False)
+        messages, _ = run_tap(
+            {**config, "run_deadline": 3600, "stream_shares": {"orders": 1e-9}}
+        )
+        assert [r["id"] for r in records_of(messages, "orders")] == [1, 2]
+
+        messages, _ = run_tap(config, state=last_state(messages))
+
+    assert 3 in [r["id"] for r in records_of(messages, "orders")]
+
+
+def test_changed_records_fallback_yields_to_the_deadline(monkeypatch):
+    monkeypatch.setattr(WooCommerceStream, "ignores_modified_after", lambda s: True)
+    coupons = [
+        {
+            "id": i,
+            "code": f"C{i}",
+            "date_modified": f"2024-01-01T10:{i // 60:02d}:{i % 60:02d}",
+        }
+        for i in range(1, 151)
+    ]
+    with FakeStore({"coupons": coupons}) as store:
+        config = store_config(store, run_deadline=3600, stream_shares={"coupons": 1e-9})
+        messages, _ = run_tap(config, catalog=select_streams(config, ["coupons"]))
+
+    assert len(store.requests_to(r"/coupons\?.*include=")) == 1
+    assert [r["id"] for r in records_of(messages, "coupons")] == list(range(1, 101))
+    bookmark = last_state(messages)["bookmarks"]["coupons"]
+    assert bookmark["replication_key_value"] < coupons[99]["date_modified"]
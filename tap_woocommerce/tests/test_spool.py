@@ -0,0 +1,52 @@
+"""Tests of reusing spooled pages when re-running from the same state."""
+
+import pytest
+
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    make_order,
+    records_of,
+    run_tap,
+    store_config,
+)
+
+
+@pytest.fixture
+def store():
+    orders = [make_order(i, f"2024-01-0{i}T10:00:00") for i in range(1, 4)]
+    notes = {f"orders/{order['id']}/notes": [] for order in orders}
+    with FakeStore({"orders": orders, **notes}) as store:
+        yield store
+
+
+def spool_config(store, tmp_path):
+    return store_config(
+        store,
+        page_spool_path=str(tmp_path / "spool.db"),
+        retry_budget=0,
+        probe_filters=False,
+    )
+
+
+def test_rerun_from_the_same_state_reuses_pages(store, tmp_path):
+    store.fail = lambda path, params: 503 if path == "orders/3/notes" else None
+    with pytest.raises(Exception):
+        run_tap(spool_config(store, tmp_path))
+    first_page = r"/orders\?(?!.*&page=)"
+    assert len(store.requests_to(first_page)) == 1
+
+    store.fail = None
+    messages, _ = run_tap(spool_config(store, tmp_path))
+
+    assert len(records_of(messages, "orders")) == 3
+    assert len(store.requests_to(first_page)) == 1
+
+
+def test_pages_are_discarded_once_a_sync_succeeds(store, tmp_path):
+    run_tap(spool_config(store, tmp_path))
+    note = {"id": 10, "note": "Shipped", "date_created": "2024-01-05T10:00:00"}
+    store.resources["orders/1/notes"].append(note)
+
+    messages, _ = run_tap(spool_config(store, tmp_path))
+
+    assert records_of(messages, "order_notes")[0]["id"] == 10
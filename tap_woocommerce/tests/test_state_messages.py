@@ -0,0 +1,84 @@
+"""Tests of how often STATE messages are written."""
+
+import pytest
+
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    last_state,
+    make_order,
+    records_of,
+    run_tap,
+    select_streams,
+    store_config,
+)
+
+
+def make_coupon(coupon_id: int) -> dict:
+    return {
+        "id": coupon_id,
+        "code": f"CODE{coupon_id}",
+        "date_modified": f"2024-01-{coupon_id:02d}T10:00:00",
+    }
+
+
+def coupon_bookmarks(messages: list) -> list:
+    bookmarks = []
+    for message in messages:
+        if message["type"] != "STATE":
+            continue
+        bookmark = message["value"]["bookmarks"]["coupons"]
+        bookmark = bookmark.get("progress_markers", bookmark)
+        if "replication_key_value" in bookmark:
+            bookmarks.append(bookmark["replication_key_value"][:10])
+    return bookmarks
+
+
+@pytest.fixture
+def store():
+    with FakeStore({"coupons": [make_coupon(i) for i in range(1, 11)]}) as store:
+        yield store
+
+
+def test_state_is_written_after_every_page(store):
+    config = store_config(store, per_page=3, state_every_page=True)
+    messages, _ = run_tap(config, catalog=select_streams(config, ["coupons"]))
+
+    # The SDK writes one after the first record, then one follows each page.
+    assert coupon_bookmarks(messages) == [
+        "2024-01-01",
+        "2024-01-03",
+        "2024-01-06",
+        "2024-01-09",
+        "2024-01-10",
+        "2024-01-10",
+    ]
+
+
+def test_min_interval_keeps_only_the_final_state(store):
+    config = store_config(store, per_page=3, state_every_records=1)
+    catalog = select_streams(config, ["coupons"])
+
+    frequent, _ = run_tap(config, catalog=catalog)
+    coalesced, _ = run_tap({**config, "state_min_interval": 3600}, catalog=catalog)
+
+    assert coupon_bookmarks(frequent) == [
+        make_coupon(i)["date_modified"][:10] for i in range(1, 11)
+    ]
+    assert coupon_bookmarks(coalesced) == ["2024-01-10"]
+    assert last_state(coalesced) == last_state(frequent)
+    assert records_of(coalesced, "coupons") == records_of(frequent, "coupons")
+
+
+def test_notes_keep_no_partition_per_order():
+    orders = [make_order(i, f"2024-01-0{i}T10:00:00") for i in range(1, 4)]
+    notes = {
+        f"orders/{order['id']}/notes": [{"id": order["id"] * 10, "note": "Paid"}]
+        for order in orders
+    }
+    with FakeStore({"orders": orders, **notes}) as store:
+        config = store_config(store, probe_filters=False)
+        catalog = select_streams(config, ["orders", "order_notes"])
+        messages, _ = run_tap(config, catalog=catalog)
+
+    assert len(records_of(messages, "order_notes")) == 3
+    assert "partitions" not in last_state(messages)["bookmarks"]["order_notes"]
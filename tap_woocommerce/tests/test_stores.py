@@ -0,0 +1,141 @@
+"""Tests of syncing several stores in one run."""
+
+import json
+
+import pytest
+
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    make_order,
+    records_of,
+    run_tap,
+    select_streams,
+    store_config,
+)
+
+
+def make_coupon(coupon_id: int) -> dict:
+    return {
+        "id": coupon_id,
+        "code": f"CODE{coupon_id}",
+        "date_modified": "2024-01-01T10:00:00",
+    }
+
+
+def test_each_store_is_synced_into_its_own_file(tmp_path):
+    first = FakeStore(
+        {"orders": [make_order(1, "2024-01-01T10:00:00")], "orders/1/notes": []}
+    )
+    second = FakeStore(
+        {"orders": [make_order(2, "2024-01-02T10:00:00")], "orders/2/notes": []}
+    )
+    with first, second:
+        config = {
+            "stores": [
+                {"store_id": "first", **store_config(first)},
+                {"store_id": "second", **store_config(second)},
+            ],
+            "stores_output_dir": str(tmp_path),
+            "user_agent": "tests",
+        }
+
+        messages, _ = run_tap(config)
+
+    for store_id, order_id in (("first", 1), ("second", 2)):
+        with open(tmp_path / f"{store_id}.jsonl") as output:
+            store_messages = [json.loads(line) for line in output]
+        assert [r["id"] for r in records_of(store_messages, "orders")] == [order_id]
+    assert set(messages[-1]["value"]["stores"]) == {"first", "second"}
+
+
+def read_store_output(output_dir, store_id: str) -> list:
+    with open(output_dir / f"{store_id}.jsonl") as output:
+        return [json.loads(line) for line in output]
+
+
+def test_stores_keep_their_files_apart(tmp_path):
+    category = {"id": 1, "name": "Shoes", "slug": "shoes"}
+    first = FakeStore(
+        {
+            "coupons": [make_coupon(1), make_coupon(2)],
+            "products/categories": [category],
+        }
+    )
+    second = FakeStore(
+        {"coupons": [make_coupon(10)], "products/categories": [category]}
+    )
+    with first, second:
+        config = {
+            "stores": [
+                {"store_id": "first", **store_config(first)},
+                {"store_id": "second", **store_config(second)},
+            ],
+            "stores_output_dir": str(tmp_path / "output"),
+            "reconcile_deletes": ["coupons"],
+            "reconcile_path": str(tmp_path / "reconcile.db"),
+            "reference_cache_path": str(tmp_path / "reference"),
+            "emitted_index_path": str(tmp_path / "index.db"),
+            "max_workers": 1,
+            "user_agent": "tests",
+        }
+        catalog = select_streams(config, ["coupons", "product_categories"])
+
+        messages, _ = run_tap(config, catalog=catalog)
+        for store_id in ("first", "second"):
+            store_messages = read_store_output(tmp_path / "output", store_id)
+            assert len(records_of(store_messages, "product_categories")) == 1
+        messages, _ = run_tap(config, state=messages[-1]["value"], catalog=catalog)
+
+    for store_id in ("first", "second"):
+        store_messages = read_store_output(tmp_path / "output", store_id)
+        coupons = records_of(store_messages, "coupons")
+        assert not [r for r in coupons if "_sdc_deleted_at" in r]
+        assert (tmp_path / store_id / "reconcile.db").exists()
+        assert (tmp_path / store_id / "index.db").exists()
+        assert (tmp_path / "reference" / store_id).is_dir()
+
+
+def test_polling_cycles_sync_every_store(tmp_path, monkeypatch):
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr("tap_woocommerce.tap.time.sleep", sleep)
+    first = FakeStore({"coupons": [make_coupon(1)]})
+    second = FakeStore({"coupons": [make_coupon(2)]})
+    with first, second:
+        config = {
+            "stores": [
+                {"store_id": "first", **store_config(first)},
+                {"store_id": "second", **store_config(second)},
+            ],
+            "stores_output_dir": str(tmp_path),
+            "probe_filters": False,
+            "poll_interval": 60,
+            "max_workers": 1,
+            "user_agent": "tests",
+        }
+        messages, _ = run_tap(config, catalog=select_streams(config, ["coupons"]))
+
+    for store in (first, second):
+        requests = store.requests_to(r"/coupons\?(?!.*&page=)")
+        assert len(requests) == 2
+        assert "modified_after=2024-01-01T10" in requests[1]
+    for store_id, coupon_id in (("first", 1), ("second", 2)):
+        store_messages = read_store_output(tmp_path, store_id)
+        assert [r["id"] for r in records_of(store_messages, "coupons")] == [coupon_id]
+    assert set(messages[-1]["value"]["stores"]) == {"first", "second"}
+
+
+def test_webhooks_are_rejected_with_stores(tmp_path):
+    with FakeStore({}) as store:
+        config = {
+            "stores": [{"store_id": "first", **store_config(store)}],
+            "webhook_port": 8080,
+            "webhook_secret": "secret",
+        }
+        with pytest.raises(ValueError):
+            run_tap(config)
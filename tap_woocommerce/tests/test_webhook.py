@@ -0,0 +1,69 @@
+"""Tests of receiving WooCommerce webhook deliveries."""
+
+import io
+import json
+
+import pytest
+
+from tap_woocommerce.tap import TapWooCommerce
+from tap_woocommerce.tests.fake_store import (
+    FakeStore,
+    make_order,
+    records_of,
+    select_streams,
+    store_config,
+)
+from tap_woocommerce.webhook import WebhookListener, sign_payload
+from tap_woocommerce.writer import MessageWriter
+
+SECRET = "secret"
+
+
+@pytest.fixture
+def listener():
+    listener = WebhookListener("127.0.0.1", 0, SECRET)
+    yield listener
+    listener.server.server_close()
+
+
+def test_signed_delivery_is_queued(listener):
+    body = json.dumps({"id": 1}).encode()
+    headers = {
+        "X-WC-Webhook-Topic": "order.updated",
+        "X-WC-Webhook-Signature": sign_payload(SECRET, body),
+    }
+
+    assert listener.receive(headers, body) == 200
+    assert listener.get(timeout=0) == ("order.updated", {"id": 1})
+
+
+def test_bad_signature_is_rejected(listener):
+    headers = {"X-WC-Webhook-Topic": "order.updated", "X-WC-Webhook-Signature": "x"}
+
+    assert listener.receive(headers, b"{}") == 401
+    assert listener.get(timeout=0) is None
+
+
+def test_ping_is_acknowledged_without_a_signature(listener):
+    assert listener.receive({}, b"webhook_id=7") == 200
+    assert listener.get(timeout=0) is None
+
+
+def test_delivered_records_get_the_meta_data_filter():
+    order = make_order(1, "2024-01-01T10:00:00")
+    order["meta_data"].append(
+        {"id": 4, "key": "_wc_order_attribution_session_entry", "value": "x" * 500}
+    )
+    with FakeStore({"orders": []}) as store:
+        config = store_config(store, meta_data_exclude={"orders": ["*_session_entry"]})
+        tap = TapWooCommerce(config=config, catalog=select_streams(config, ["orders"]))
+        output = io.BytesIO()
+        tap.message_writer = MessageWriter(output)
+
+        tap.emit_webhook("order.updated", order)
+
+    messages = [json.loads(line) for line in output.getvalue().splitlines()]
+    [record] = records_of(messages, "orders")
+    assert record["attribution_metadata"] == {
+        "_wc_order_attribution_source_type": "organic"
+    }
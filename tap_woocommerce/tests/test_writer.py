@@ -0,0 +1,61 @@
+"""Tests of the Singer message writer."""
+
+import gzip
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+import singer
+
+from tap_woocommerce.writer import MessageWriter, orjson
+
+ENCODERS = ["json"] + (["orjson"] if orjson is not None else [])
+
+
+@pytest.mark.parametrize("encoder", ENCODERS)
+def test_decimals_keep_their_digits(encoder):
+    output = io.BytesIO()
+    writer = MessageWriter(output, encoder=encoder)
+    record = {"id": Decimal(7), "total": Decimal("0.1000000000000000055511151231")}
+
+    writer.write_message(singer.RecordMessage(stream="orders", record=record))
+
+    line = output.getvalue()
+    assert b'"id": 7' in line or b'"id":7' in line
+    assert b"0.1000000000000000055511151231" in line
+
+
+@pytest.mark.skipif(orjson is None, reason="orjson is not installed")
+def test_orjson_writes_naive_datetimes_as_utc():
+    output = io.BytesIO()
+    writer = MessageWriter(output, encoder="orjson")
+    record = {"date_modified": datetime(2024, 1, 1, 10)}
+
+    writer.write_message(singer.RecordMessage(stream="orders", record=record))
+
+    message = json.loads(output.getvalue())
+    assert message["record"]["date_modified"] == "2024-01-01T10:00:00+00:00"
+
+
+def test_state_flushes_buffer_and_repeated_state_is_dropped():
+    output = io.BytesIO()
+    writer = MessageWriter(output, buffer_size=1024 * 1024)
+    writer.write_message(singer.RecordMessage(stream="orders", record={"id": 1}))
+    assert output.getvalue() == b""
+
+    writer.write_message(singer.StateMessage(value={"bookmarks": {}}))
+    writer.write_message(singer.StateMessage(value={"bookmarks": {}}))
+
+    types = [json.loads(line)["type"] for line in output.getvalue().splitlines()]
+    assert types == ["RECORD", "STATE"]
+
+
+def test_compressed_output():
+    output = io.BytesIO()
+    writer = MessageWriter(output, compress=True)
+    writer.write_message(singer.RecordMessage(stream="orders", record={"id": 1}))
+    writer.close()
+
+    assert json.loads(gzip.decompress(output.getvalue()))["record"] == {"id": 1}
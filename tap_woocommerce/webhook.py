@@ -0,0 +1,87 @@
+"""HTTP listener for WooCommerce webhook deliveries."""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+# Webhook resources and the streams their payloads belong to.
+TOPIC_STREAMS = {
+    "order": "orders",
+    "product": "products",
+    "customer": "customers",
+    "coupon": "coupons",
+}
+
+
+def sign_payload(secret: str, body: bytes) -> str:
+    """Return the `X-WC-Webhook-Signature` WooCommerce sends for a body."""
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+
+class WebhookListener:
+    """Receives webhook deliveries and queues them as (topic, payload) pairs.
+
+    Deliveries are acknowledged as soon as their signature is verified, so a
+    slow target never makes WooCommerce time out and disable the webhook. The
+    queued payloads are emitted by the thread calling `get`.
+    """
+
+    def __init__(self, host: str, port: int, secret: str) -> None:
+        self.secret = secret
+        self.deliveries: queue.Queue = queue.Queue()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _handler_class(self) -> type:
+        listener = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self.send_response(listener.receive(self.headers, body))
+                self.end_headers()
+
+            def log_message(self, format: str, *args) -> None:
+                logging.debug(format % args)
+
+        return Handler
+
+    def receive(self, headers, body: bytes) -> int:
+        """Verify and queue a delivery, returning the HTTP status to answer."""
+        topic = headers.get("X-WC-Webhook-Topic")
+        if not topic:
+            # WooCommerce pings a new webhook with an unsigned, form-encoded
+            # `webhook_id`; nothing is queued for it.
+            return 200
+        signature = headers.get("X-WC-Webhook-Signature", "")
+        if not hmac.compare_digest(signature, sign_payload(self.secret, body)):
+            logging.warning("Rejected webhook delivery with a bad signature.")
+            return 401
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            logging.warning(f"Rejected {topic} webhook delivery with invalid JSON.")
+            return 400
+        self.deliveries.put((topic, payload))
+        return 200
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def get(self, timeout: float) -> Optional[Tuple[str, dict]]:
+        """Return the next delivery, or None if none arrived within `timeout`."""
+        try:
+            return self.deliveries.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
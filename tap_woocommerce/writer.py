@@ -0,0 +1,140 @@
+"""Singer message output for tap-woocommerce."""
+
+import gzip
+import sys
+import threading
+from decimal import Decimal
+from typing import IO, Any, Callable, Dict, List, Optional
+
+import singer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode_json(message: singer.Message) -> bytes:
+    """Encode a message the way singer-python does."""
+    return (singer.format_message(message) + "\n").encode()
+
+
+class InexactDecimal(TypeError):
+    """A decimal that orjson could only encode by rounding it to a float."""
+
+
+def orjson_default(value: Any) -> Any:
+    """Serialize the types orjson does not handle natively."""
+    if isinstance(value, Decimal):
+        if value == value.to_integral_value():
+            return int(value)
+        raise InexactDecimal(str(value))
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def encode_orjson(message: singer.Message) -> bytes:
+    """Encode a message with orjson. Naive datetimes are treated as UTC.
+
+    Messages holding non-integral decimals are encoded the way singer-python
+    does, which writes their exact digits.
+    """
+    try:
+        return orjson.dumps(
+            message.asdict(),
+            default=orjson_default,
+            option=orjson.OPT_NAIVE_UTC | orjson.OPT_APPEND_NEWLINE,
+        )
+    except orjson.JSONEncodeError as e:
+        if isinstance(e.__cause__, InexactDecimal):
+            return encode_json(message)
+        raise
+
+
+ENCODERS: Dict[str, Callable[[singer.Message], bytes]] = {
+    "json": encode_json,
+    "orjson": encode_orjson,
+}
+
+
+class MessageWriter:
+    """Writes Singer messages to an output file, one JSON document per line.
+
+    Writes are serialized with a lock so streams synced from several threads
+    never interleave partial lines. Lines are buffered up to `buffer_size`
+    bytes; STATE messages always flush, so a bookmark never reaches the
+    target ahead of its records. A STATE message identical to the previous
+    one is not written again.
+    """
+
+    def __init__(
+        self,
+        output: Optional[IO[bytes]] = None,
+        encoder: str = "json",
+        buffer_size: int = 0,
+        compress: bool = False,
+    ) -> None:
+        if encoder == "orjson" and orjson is None:
+            raise ImportError("The orjson encoder requires `pip install orjson`.")
+        self.output = output or sys.stdout.buffer
+        if compress:
+            self.output = gzip.GzipFile(fileobj=self.output, mode="wb")
+        self.compress = compress
+        self.encode = ENCODERS[encoder]
+        self.buffer_size = buffer_size
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+        self.last_state: Optional[bytes] = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(
+        cls, config: dict, output: Optional[IO[bytes]] = None
+    ) -> "MessageWriter":
+        """Return a writer for the output settings of a tap config."""
+        return cls(
+            output,
+            encoder=config.get("message_encoder", "json"),
+            buffer_size=config.get("output_buffer_size", 0),
+            compress=config.get("output_gzip", False),
+        )
+
+    def write_message(self, message: singer.Message) -> None:
+        """Write a single message, flushing when the buffer is full."""
+        line = self.encode(message)
+        with self.lock:
+            if isinstance(message, singer.StateMessage):
+                if line == self.last_state:
+                    return
+                self.last_state = line
+            self.buffer.append(line)
+            self.buffered += len(line)
+            if self.buffered >= self.buffer_size or isinstance(
+                message, singer.StateMessage
+            ):
+                self._flush()
+
+    def write_line(self, line: bytes) -> None:
+        """Write an already encoded message."""
+        with self.lock:
+            self.buffer.append(line)
+            self.buffered += len(line)
+            if self.buffered >= self.buffer_size:
+                self._flush()
+
+    def flush(self) -> None:
+        """Write out the buffered messages."""
+        with self.lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        self.output.write(b"".join(self.buffer))
+        self.output.flush()
+        self.buffer = []
+        self.buffered = 0
+
+    def close(self) -> None:
+        """Flush the remaining messages and finish the compressed stream."""
+        with self.lock:
+            self._flush()
+            if self.compress:
+                self.output.close()